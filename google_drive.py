@@ -1,80 +1,507 @@
 import os
-import json
-from io import BytesIO
 import csv
+import json
+import time
+import zlib
+import random
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from google_auth_httplib2 import AuthorizedHttp
 from google.oauth2.service_account import Credentials
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseUpload
+from googleapiclient.http import MediaIoBaseUpload, build_http
+from googleapiclient.errors import HttpError
 from dotenv import load_dotenv
-from utils import format_dataframe_for_export
+
+try:
+    import zstandard
+except ImportError:  # zstd uploads need the zstandard package
+    zstandard = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pa_parquet
+except ImportError:  # Parquet uploads need pyarrow
+    pa = None
+
+# Upload formats besides plain CSV, with their file name suffix and MIME type
+UPLOAD_FORMATS = {
+    'gzip': ('.csv.gz', 'application/gzip'),
+    'zstd': ('.csv.zst', 'application/zstd'),
+    'parquet': ('.parquet', 'application/vnd.apache.parquet'),
+}
+
+def upload_name(filename, compression):
+    """Drive file name of a CSV upload in the given format ('file.csv' -> 'file.csv.gz')."""
+    if compression is None:
+        return filename
+    base = filename[:-4] if filename.lower().endswith('.csv') else filename
+    return base + UPLOAD_FORMATS[compression][0]
+
+def _compressor(compression, level):
+    """Streaming gzip or zstd compressor with compress(data) and flush().
+    
+    The default levels are fast ones, so compressing keeps up with the uplink.
+    """
+    if compression == 'gzip':
+        return zlib.compressobj(1 if level is None else level, zlib.DEFLATED, 31)
+    if compression == 'zstd':
+        if zstandard is None:
+            raise ImportError("zstd uploads need the zstandard package")
+        return zstandard.ZstdCompressor(level=3 if level is None else level).compressobj()
+    raise ValueError(f"Unknown upload compression: {compression}")
+
+def compress_chunks(chunks, compression, level=None):
+    """Compress an iterator of byte chunks as one gzip or zstd stream."""
+    compressor = _compressor(compression, level)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("Parquet uploads need pyarrow")
+
+def compress_csv_file(path, destination, compression, level=None):
+    """Write an encoded CSV file gzip or zstd compressed, or as Parquet keeping every value's text."""
+    if compression == 'parquet':
+        _require_pyarrow()
+        with open(path, newline='', encoding='utf-8') as source:
+            columns = next(csv.reader(source), [])
+        reader = pa_csv.open_csv(
+            path,
+            parse_options=pa_csv.ParseOptions(newlines_in_values=True),
+            convert_options=pa_csv.ConvertOptions(column_types={col: pa.string() for col in columns})
+        )
+        with pa_parquet.ParquetWriter(
+            destination, reader.schema, compression='zstd', compression_level=level
+        ) as writer:
+            for batch in reader:
+                writer.write_batch(batch)
+        return destination
+    
+    with open(path, 'rb') as source, open(destination, 'wb') as target:
+        chunks = iter(lambda: source.read(1024 * 1024), b'')
+        for data in compress_chunks(chunks, compression, level):
+            target.write(data)
+    return destination
+
+class UploadCancelled(Exception):
+    """Raised while an upload waits on a rate limit or retry and its cancel_event is set."""
+
+def _wait(seconds, cancel_event=None):
+    """Sleep for seconds, or until cancel_event is set, which raises UploadCancelled."""
+    if cancel_event is None:
+        time.sleep(seconds)
+    elif cancel_event.wait(seconds):
+        raise UploadCancelled("Upload cancelled")
+
+class TokenBucket:
+    """Thread-safe request budget of `rate` requests per second, with bursts up to `capacity`.
+    
+    The rate halves on slow_down() (down to min_rate) and creeps back up to
+    max_rate on speed_up(), so callers settle at the rate the server accepts.
+    """
+    def __init__(self, rate, capacity, min_rate=0.5):
+        self.max_rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, cancel_event=None):
+        """Block until a request may be sent; returns the seconds waited.
+        
+        Setting cancel_event ends the wait with UploadCancelled.
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            _wait(delay, cancel_event)
+            waited += delay
+
+    def slow_down(self):
+        with self._lock:
+            self._refill()
+            self.rate = max(self.min_rate, self.rate / 2)
+
+    def speed_up(self):
+        with self._lock:
+            self._refill()
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+
+class UploadScheduler:
+    """Sends Drive requests within a TokenBucket budget, retrying rate limits and server errors.
+    
+    Each request, and each chunk of a resumable upload, takes one token.
+    Retries wait with exponential backoff and full jitter (or the server's
+    Retry-After, if longer) and rate limits also slow the bucket down.
+    Resumable uploads are sent chunk by chunk; after an error the next chunk
+    call asks Drive for the last byte it confirmed and continues from there,
+    and an expired upload session is restarted from the first byte.
+    """
+    RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+    # Drive reports some rate limits as 403 with one of these reasons
+    RATE_LIMIT_REASONS = {'rateLimitExceeded', 'userRateLimitExceeded'}
+
+    def __init__(self, requests_per_second=10, burst=20, max_retries=8, base_delay=1.0, max_delay=64.0):
+        self.bucket = TokenBucket(requests_per_second, burst)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def _is_rate_limit(self, error):
+        if error.resp.status == 429:
+            return True
+        if error.resp.status == 403:
+            reasons = {detail.get('reason') for detail in error.error_details or [] if isinstance(detail, dict)}
+            return bool(reasons & self.RATE_LIMIT_REASONS)
+        return False
+
+    def _retry_delay(self, retry, error):
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** retry))
+        retry_after = error.resp.get('retry-after') if isinstance(error, HttpError) else None
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, float(retry_after))
+        return delay
+
+    def execute(self, request, stats=None, cancel_event=None):
+        """Run an API request to completion and return its response.
+        
+        stats, if given, is filled with the 'attempts' (requests sent),
+        'retries' and 'seconds' spent, also when the request fails.
+        Once cancel_event is set, no further request or chunk is sent and any
+        wait for the rate limit or a retry ends with UploadCancelled.
+        """
+        stats = stats if stats is not None else {}
+        stats.update(attempts=0, retries=0, seconds=0.0)
+        started = time.perf_counter()
+        try:
+            response = None
+            while response is None:
+                if cancel_event is not None and cancel_event.is_set():
+                    raise UploadCancelled("Upload cancelled")
+                self.bucket.acquire(cancel_event)
+                stats['attempts'] += 1
+                try:
+                    if request.resumable is not None:
+                        _, response = request.next_chunk()
+                    else:
+                        response = request.execute()
+                except HttpError as e:
+                    rate_limited = self._is_rate_limit(e)
+                    expired = e.resp.status in (404, 410) and request.resumable_uri is not None
+                    if stats['retries'] >= self.max_retries or not (
+                        rate_limited or expired or e.resp.status in self.RETRYABLE_STATUSES
+                    ):
+                        raise
+                    if rate_limited:
+                        self.bucket.slow_down()
+                    if expired:
+                        # The upload session is gone; start a new one from the first byte
+                        request.resumable_uri = None
+                        request.resumable_progress = 0
+                        request._in_error_state = False
+                    _wait(self._retry_delay(stats['retries'], e), cancel_event)
+                    stats['retries'] += 1
+                except (ConnectionError, TimeoutError) as e:
+                    if stats['retries'] >= self.max_retries:
+                        raise
+                    _wait(self._retry_delay(stats['retries'], e), cancel_event)
+                    stats['retries'] += 1
+                else:
+                    self.bucket.speed_up()
+            return response
+        finally:
+            stats['seconds'] = time.perf_counter() - started
+
 
 class GoogleDriveManager:
     SCOPES = ['https://www.googleapis.com/auth/drive']
     REMOVED_FOLDER_ID = "18evx04gWua9ls1mDiIr5FvAQhdFbrwfr"
     SCRUBBED_FOLDER_ID = "1-jYrCY5ev44Hy5fXVwOZSjw7xPSTy9ML"
+    # Files uploaded at the same time by upload_csv_files
+    UPLOAD_WORKERS = 8
+    # Resumable uploads are sent in chunks of this size (a multiple of 256 KB)
+    UPLOAD_CHUNK_BYTES = 8 * 1024 * 1024
+    # Threads compressing upload files ahead of the uploads
+    COMPRESSION_WORKERS = os.cpu_count() or 1
 
-    def __init__(self):
+    def __init__(self, credentials=None, api_endpoint=None, http_factory=build_http,
+                 upload_workers=UPLOAD_WORKERS, scheduler=None, ledger=None):
+        """Connect to Google Drive.
+        
+        credentials default to the service account in GOOGLE_CREDENTIALS_JSON.
+        api_endpoint (e.g. 'https://localhost:8443/drive/v3/') sends the API
+        calls to another server, such as a local fake Drive for testing; media
+        uploads always use HTTPS, so http_factory, which creates the HTTP
+        client of each thread, can be given one trusting that server. Every
+        request goes through the scheduler (an UploadScheduler by default).
+        With an UploadLedger, file uploads skip files Drive already holds
+        unchanged, replace changed files in place and copy known content
+        under new names on the server (see _sync_file).
+        """
         load_dotenv()
-        self.service = self._authenticate()
+        self.api_endpoint = api_endpoint
+        self.http_factory = http_factory
+        self.upload_workers = upload_workers
+        self.scheduler = scheduler or UploadScheduler()
+        self.ledger = ledger
+        self.credentials = credentials or self._authenticate()
+        # httplib2 connections are not thread-safe, so every thread gets its own client
+        self._clients = threading.local()
+        self.service = self._service()
 
     def _authenticate(self):
-        """Authenticate with Google Drive API"""
+        """Load the service account credentials for the Google Drive API"""
         try:
             credentials_json = os.getenv("GOOGLE_CREDENTIALS_JSON")
             if not credentials_json:
                 raise ValueError("GOOGLE_CREDENTIALS_JSON not found in environment variables.")
             
             credentials_dict = json.loads(credentials_json)
-            creds = Credentials.from_service_account_info(credentials_dict, scopes=self.SCOPES)
-            return build('drive', 'v3', credentials=creds)
+            return Credentials.from_service_account_info(credentials_dict, scopes=self.SCOPES)
         except Exception as e:
             print(f"Google Drive authentication failed: {e}")
             raise e
 
-    def upload_dataframe(self, df, filename, folder_id):
-        """Upload a DataFrame as a properly formatted CSV file to Google Drive"""
-        try:
-            # Format DataFrame
-            formatted_df = format_dataframe_for_export(df)
-            
-            # Create CSV in memory with proper formatting
-            csv_buffer = BytesIO()
-            formatted_df.to_csv(
-                csv_buffer,
-                index=False,
-                encoding='utf-8-sig',
-                lineterminator='\n',
-                quoting=csv.QUOTE_MINIMAL,
-                sep=',',
-                float_format='%.2f'
-            )
-            csv_buffer.seek(0)
-
-            # Prepare file metadata
-            file_metadata = {
-                'name': filename,
-                'parents': [folder_id],
-                'mimeType': 'text/csv'
-            }
-
-            # Create media upload object
-            media = MediaIoBaseUpload(
-                csv_buffer,
-                mimetype='text/csv',
-                resumable=True
+    def _service(self):
+        """Drive client of the calling thread, on its own authorized HTTP connection"""
+        service = getattr(self._clients, 'service', None)
+        if service is None:
+            client_options = {'api_endpoint': self.api_endpoint} if self.api_endpoint else None
+            http = self.http_factory()
+            # Resumable uploads answer "308 Resume Incomplete", which must not be followed as a redirect
+            http.redirect_codes = http.redirect_codes - {308}
+            service = build(
+                'drive', 'v3',
+                http=AuthorizedHttp(self.credentials, http=http),
+                client_options=client_options,
+                cache_discovery=False
             )
+            self._clients.service = service
+        return service
+
+    def _upload_media(self, media, filename, folder_id, stats=None, file_id=None, md5=None, cancel_event=None):
+        """Create a file on Google Drive from a media upload object, or replace the content of file_id
+        
+        With md5, Drive's md5Checksum of the stored content must match it.
+        stats and cancel_event are as for UploadScheduler.execute.
+        """
+        stats = stats if stats is not None else {}
+        try:
+            if file_id is None:
+                # Prepare file metadata
+                file_metadata = {
+                    'name': filename,
+                    'parents': [folder_id],
+                    'mimeType': media.mimetype()
+                }
+                request = self._service().files().create(
+                    body=file_metadata,
+                    media_body=media,
+                    fields='id,md5Checksum'
+                )
+            else:
+                request = self._service().files().update(
+                    fileId=file_id,
+                    body={'mimeType': media.mimetype()},
+                    media_body=media,
+                    fields='id,md5Checksum'
+                )
 
-            # Execute upload
-            file = self.service.files().create(
-                body=file_metadata,
-                media_body=media,
-                fields='id'
-            ).execute()
+            # Execute upload, retrying rate limits and server errors
+            file = self.scheduler.execute(request, stats, cancel_event)
+            if md5 is not None and file.get('md5Checksum') != md5:
+                raise ValueError(
+                    f"Google Drive stored {filename} with checksum {file.get('md5Checksum')}, expected {md5}"
+                )
 
-            print(f"Uploaded {filename} to Google Drive successfully! File ID: {file.get('id')}")
+            print(
+                f"{'Uploaded' if file_id is None else 'Updated'} {filename} on Google Drive successfully! "
+                f"File ID: {file.get('id')} "
+                f"({stats['attempts']} requests, {stats['retries']} retries, {stats['seconds']:.2f}s)"
+            )
             return file.get('id')
         
         except Exception as e:
-            print(f"Failed to upload {filename}: {e}")
+            print(f"Failed to upload {filename} after {stats.get('attempts', 0)} requests: {e}")
             raise e
+
+    def _drive_md5(self, file_id, cancel_event=None):
+        """md5Checksum of a Drive file, or None if it is gone or in the trash"""
+        request = self._service().files().get(fileId=file_id, fields='md5Checksum,trashed')
+        try:
+            file = self.scheduler.execute(request, cancel_event=cancel_event)
+        except HttpError as e:
+            if e.resp.status == 404:
+                return None
+            raise
+        return None if file.get('trashed') else file.get('md5Checksum')
+
+    def _copy_file(self, file_id, filename, folder_id, md5, stats=None, cancel_event=None):
+        """Copy a Drive file under a new name on the server; returns the copy's id"""
+        request = self._service().files().copy(
+            fileId=file_id,
+            body={'name': filename, 'parents': [folder_id]},
+            fields='id,md5Checksum'
+        )
+        file = self.scheduler.execute(request, stats, cancel_event)
+        if file.get('md5Checksum') != md5:
+            raise ValueError(
+                f"Google Drive copied {filename} with checksum {file.get('md5Checksum')}, expected {md5}"
+            )
+        print(f"Copied {filename} on Google Drive from an identical file. File ID: {file.get('id')}")
+        return file.get('id')
+
+    def _sync_file(self, path, filename, folder_id, mimetype, stats=None, cancel_event=None):
+        """Upload a file unless the folder already holds it; returns (file_id, action).
+        
+        Without a ledger every file is created ('created'). With one, a file
+        name the ledger lists for the folder with the same content, which
+        Drive confirms by md5Checksum, is not sent again ('skipped', with the
+        existing file's id); a known file name with new content is replaced
+        in place with files().update ('updated'). A new name whose content
+        the folder already holds under another name is copied on the server
+        with files().copy ('copied'); anything else is created.
+        """
+        if self.ledger is None:
+            return self._upload_file(path, filename, folder_id, mimetype, stats, cancel_event=cancel_event), 'created'
+
+        md5 = self.ledger.file_md5(path)
+        size = os.path.getsize(path)
+        previous = self.ledger.find_name(folder_id, filename)
+        if previous is not None:
+            drive_md5 = self._drive_md5(previous['file_id'], cancel_event)
+            if drive_md5 is None:
+                # Deleted since it was recorded
+                self.ledger.forget(previous['file_id'])
+            elif drive_md5 == md5:
+                print(f"Skipped {filename}: unchanged on Google Drive")
+                if previous['md5'] != md5:
+                    self.ledger.record(folder_id, filename, previous['file_id'], md5, size)
+                return previous['file_id'], 'skipped'
+            else:
+                try:
+                    file_id = self._upload_file(
+                        path, filename, folder_id, mimetype, stats, file_id=previous['file_id'], md5=md5,
+                        cancel_event=cancel_event
+                    )
+                    self.ledger.record(folder_id, filename, file_id, md5, size)
+                    return file_id, 'updated'
+                except HttpError as e:
+                    if e.resp.status != 404:
+                        raise
+                    self.ledger.forget(previous['file_id'])
+
+        existing = self.ledger.find_content(folder_id, md5)
+        if existing is not None:
+            if self._drive_md5(existing['file_id'], cancel_event) == md5:
+                file_id = self._copy_file(existing['file_id'], filename, folder_id, md5, stats, cancel_event)
+                self.ledger.record(folder_id, filename, file_id, md5, size)
+                return file_id, 'copied'
+            # Deleted or changed on Drive since it was recorded
+            self.ledger.forget(existing['file_id'])
+
+        file_id = self._upload_file(path, filename, folder_id, mimetype, stats, md5=md5, cancel_event=cancel_event)
+        self.ledger.record(folder_id, filename, file_id, md5, size)
+        return file_id, 'created'
+
+    def _upload_file(self, path, filename, folder_id, mimetype, stats=None, file_id=None, md5=None, cancel_event=None):
+        # The file is closed as soon as the upload ends, so temporary files can be removed on Windows
+        with open(path, 'rb') as source:
+            media = MediaIoBaseUpload(source, mimetype=mimetype, chunksize=self.UPLOAD_CHUNK_BYTES, resumable=True)
+            return self._upload_media(media, filename, folder_id, stats, file_id, md5, cancel_event)
+
+    def upload_csv_file(self, path, filename, folder_id, stats=None):
+        """Upload an already encoded CSV file (see utils.write_csv_file) to Google Drive as is
+        
+        With a ledger, unchanged files are skipped and changed ones updated (see _sync_file).
+        """
+        return self._sync_file(path, filename, folder_id, 'text/csv', stats)[0]
+
+    def upload_csv_files(self, uploads, cancel_event=None, on_done=None, compression=None, level=None):
+        """Upload several encoded CSV files concurrently, upload_workers at a time.
+        
+        uploads holds (path, filename, folder_id) tuples. A failing upload does
+        not stop the others: one result dict per upload is returned, in order,
+        with its 'filename', Drive 'file_id', 'error' (None on success), the
+        'action' taken ('created', 'updated', 'copied' or 'skipped', see
+        _sync_file), the 'attempts', 'retries' and 'seconds' it took and the
+        'bytes' sent.
+        on_done(result) is called from the upload thread as each file
+        finishes. Once cancel_event is set, files not started yet are skipped
+        and uploads in progress stop at their next request or wait, all with
+        the error 'Upload cancelled'.
+        
+        With compression ('gzip', 'zstd' or 'parquet', see compress_csv_file)
+        the files are converted on COMPRESSION_WORKERS threads, ahead of and
+        alongside the uploads of the files before them, and uploaded under
+        upload_name.
+        """
+        mimetype = UPLOAD_FORMATS[compression][1] if compression else 'text/csv'
+        if compression in ('gzip', 'zstd'):
+            _compressor(compression, level)  # fails early on unavailable formats
+        elif compression == 'parquet':
+            _require_pyarrow()
+
+        with tempfile.TemporaryDirectory(prefix='drive_upload_') as work_dir, \
+                ThreadPoolExecutor(max_workers=self.COMPRESSION_WORKERS) as converter:
+            prepared = [
+                converter.submit(
+                    compress_csv_file, path, os.path.join(work_dir, f'{i}{UPLOAD_FORMATS[compression][0]}'),
+                    compression, level
+                ) if compression else None
+                for i, (path, _, _) in enumerate(uploads)
+            ]
+
+            def upload(i, path, filename, folder_id):
+                result = {
+                    'filename': upload_name(filename, compression), 'file_id': None, 'error': None,
+                    'action': None, 'attempts': 0, 'retries': 0, 'seconds': 0.0, 'bytes': 0
+                }
+                if cancel_event is not None and cancel_event.is_set():
+                    result['error'] = 'Upload cancelled'
+                    return result
+                try:
+                    if prepared[i] is not None:
+                        path = prepared[i].result()
+                    result['file_id'], result['action'] = self._sync_file(
+                        path, result['filename'], folder_id, mimetype, stats=result, cancel_event=cancel_event
+                    )
+                    if result['action'] in ('created', 'updated'):
+                        result['bytes'] = os.path.getsize(path)
+                except Exception as e:
+                    result['error'] = str(e)
+                if on_done is not None:
+                    on_done(result)
+                return result
+
+            try:
+                with ThreadPoolExecutor(max_workers=self.upload_workers) as pool:
+                    futures = [pool.submit(upload, i, *entry) for i, entry in enumerate(uploads)]
+                return [future.result() for future in futures]
+            finally:
+                # Conversions of skipped files are dropped before their directory is removed
+                for future in prepared:
+                    if future is not None:
+                        future.cancel()
+                wait([future for future in prepared if future is not None])
@@ -0,0 +1,213 @@
+import pandas as pd
+from processor import get_phone_columns, convert_phone_columns_to_string
+from utils import NUMBER_PATTERN, clean_nan_values
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.compute as pa_compute
+except ImportError:  # Without pyarrow, files are read with the pandas C parser
+    pa = None
+
+# pandas' default missing value and boolean spellings, so both engines agree
+NA_VALUES = [
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND',
+    '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'
+]
+TRUE_VALUES = ['True', 'TRUE', 'true']
+FALSE_VALUES = ['False', 'FALSE', 'false']
+
+def read_header(path):
+    """Column names of a CSV file, as pandas names them."""
+    return pd.read_csv(path, nrows=0, encoding='utf-8').columns
+
+def _read_with_pyarrow(path, columns, phone_cols, usecols):
+    """Read a CSV with the multi-threaded pyarrow reader.
+
+    Phone columns come back as Arrow-backed strings. Returns None when
+    pyarrow cannot match the pandas parser: on parse errors, on rows with
+    fewer fields than the header, which pandas pads but pyarrow can only skip,
+    and on integers too large for int64.
+    """
+    short_rows = []
+
+    def skip_row(row):
+        if row.actual_columns < row.expected_columns:
+            short_rows.append(row.number)
+        return 'skip'
+
+    def read(text_cols, newlines_in_values):
+        short_rows.clear()
+        return pa_csv.read_csv(
+            path,
+            # The header was read by pandas so column names match its naming
+            read_options=pa_csv.ReadOptions(column_names=list(columns), skip_rows=1),
+            parse_options=pa_csv.ParseOptions(
+                newlines_in_values=newlines_in_values, invalid_row_handler=skip_row
+            ),
+            convert_options=pa_csv.ConvertOptions(
+                column_types={col: pa.string() for col in text_cols},
+                include_columns=list(usecols) if usecols is not None else None,
+                null_values=NA_VALUES,
+                true_values=TRUE_VALUES,
+                false_values=FALSE_VALUES,
+                strings_can_be_null=True
+            )
+        )
+
+    # Quoted line breaks split rows between parse blocks, which shows up as
+    # short rows or parse errors; only then read again with the slower
+    # line-break aware parser
+    newlines_in_values = len(columns) == 1
+    try:
+        table = read(phone_cols, newlines_in_values)
+        if short_rows and not newlines_in_values:
+            newlines_in_values = True
+            table = read(phone_cols, newlines_in_values)
+    except pa.ArrowInvalid:
+        if newlines_in_values:
+            return None
+        newlines_in_values = True
+        try:
+            table = read(phone_cols, newlines_in_values)
+        except pa.ArrowInvalid:
+            return None
+    if short_rows:
+        return None
+
+    # Integers beyond int64 come back from pyarrow as doubles, losing digits,
+    # where pandas keeps them as uint64 or text
+    for field in table.schema:
+        if pa.types.is_floating(field.type):
+            largest = pa_compute.max(pa_compute.abs(table.column(field.name))).as_py()
+            if largest is not None and largest >= 2 ** 63:
+                return None
+
+    # pandas leaves dates and times as text; dates convert back losslessly,
+    # times and timestamps are read again as text
+    time_cols = [
+        field.name for field in table.schema
+        if pa.types.is_time(field.type) or pa.types.is_timestamp(field.type)
+    ]
+    if time_cols:
+        table = read(list(phone_cols) + time_cols, newlines_in_values)
+    for i, field in enumerate(table.schema):
+        if pa.types.is_date(field.type):
+            table = table.set_column(i, field.name, table.column(i).cast(pa.string()))
+
+    # Phone columns skip the conversion to Python strings; the ones holding
+    # decimals are restored by _restore_numeric_phones on object values
+    df = table.drop_columns(phone_cols).to_pandas()
+    for col in phone_cols:
+        values = table.column(col)
+        if pa_compute.any(pa_compute.match_substring_regex(values, '[.eE]')).as_py():
+            values = values.to_pandas()
+        else:
+            values = pd.arrays.ArrowStringArray(values)
+        df.insert(table.column_names.index(col), col, values)
+    return df
+
+def _restore_numeric_phones(df, phone_cols):
+    """Turn phone texts written as decimals ('5551234567.0', '5.551234567E9') back into numbers.
+
+    Read as text they would keep the fraction digits; as numbers they are
+    normalized like the floats pandas used to parse them into.
+    """
+    for col in phone_cols:
+        values = df[col]
+        if values.dtype != object:
+            continue
+        decimal = values.str.contains('[.eE]', na=False).to_numpy()
+        if not decimal.any():
+            continue
+        decimal[decimal] = values[decimal].str.fullmatch(NUMBER_PATTERN).to_numpy(dtype=bool)
+        if decimal.any():
+            df[col] = values.where(~decimal, pd.to_numeric(values[decimal]).astype(object))
+    return df
+
+def read_csv_file(path, usecols=None):
+    """Read an uploaded CSV file.
+
+    The header is read first so phone columns (see get_phone_columns) can be
+    read as text, keeping every digit instead of going through floats. With
+    pyarrow installed its multi-threaded reader is used. usecols restricts
+    the columns that are materialized.
+    """
+    columns = read_header(path)
+    if usecols is not None:
+        usecols = [col for col in columns if col in usecols]
+    phone_cols = get_phone_columns(pd.DataFrame(columns=usecols if usecols is not None else columns))
+
+    df = None
+    if pa is not None:
+        df = _read_with_pyarrow(path, columns, phone_cols, usecols)
+    if df is None:
+        df = pd.read_csv(
+            path,
+            low_memory=False,
+            encoding='utf-8',
+            on_bad_lines='skip',
+            float_precision='round_trip',
+            dtype={col: str for col in phone_cols},
+            usecols=usecols
+        )
+    return _restore_numeric_phones(df, phone_cols)
+
+def read_log_file(path):
+    """Read a log file with all of its columns."""
+    return read_csv_file(path)
+
+def read_list_file(path):
+    """Read a list file with all of its columns.
+
+    Only Phone and Log Type are used for counting, but the scrubbed list is
+    exported with every column, so none are left out.
+    """
+    return read_csv_file(path)
+
+def compact_frame(df, max_category_ratio=0.2):
+    """Store text columns compactly instead of as one Python string per cell.
+
+    Columns with at most max_category_ratio distinct values per row become
+    categoricals; other all-text columns become Arrow-backed strings when
+    pyarrow is installed. Numeric columns are left as they are.
+    """
+    for col in df.columns:
+        values = df[col]
+        if values.empty or not (values.dtype == object or isinstance(values.dtype, pd.StringDtype)):
+            continue
+        if values.nunique(dropna=False) <= max_category_ratio * len(values):
+            df[col] = values.astype('category')
+        elif pa is not None and pd.api.types.infer_dtype(values, skipna=True) == 'string':
+            df[col] = values.astype(pd.StringDtype('pyarrow'))
+    return df
+
+def clean_frame(df, compact=False):
+    """Clean a freshly read frame the way process_files does (NaN spellings, phone formats)."""
+    df = clean_nan_values(df, inplace=True)
+    df = convert_phone_columns_to_string(df)
+    return compact_frame(df) if compact else df
+
+def load_log_file(path, cache=None, compact=False):
+    """Read and clean a log file, from the ParseCache when it has the file.
+
+    With compact, text columns are stored as in compact_frame.
+    """
+    if cache is None:
+        return clean_frame(read_log_file(path), compact)
+    return cache.load(
+        path, 'log-compact' if compact else 'log',
+        lambda source: clean_frame(read_log_file(source), compact)
+    )
+
+def load_list_file(path, cache=None, compact=False):
+    """Read and clean a list file, from the ParseCache when it has the file.
+
+    With compact, text columns are stored as in compact_frame.
+    """
+    if cache is None:
+        return clean_frame(read_list_file(path), compact)
+    return cache.load(
+        path, 'list-compact' if compact else 'list',
+        lambda source: clean_frame(read_list_file(source), compact)
+    )
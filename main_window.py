@@ -1,14 +1,24 @@
 import sys
+import multiprocessing
 from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                              QPushButton, QLabel, QFileDialog, QSpinBox, 
-                             QLineEdit, QScrollArea, QGridLayout, QMessageBox, QHBoxLayout,QProgressBar)
+                             QLineEdit, QScrollArea, QGridLayout, QMessageBox, QHBoxLayout,QProgressBar,
+                             QCheckBox)
 from PySide6.QtCore import Qt
 import pandas as pd
-from utils import clean_nan_values, clean_number_to_text, create_zip_file
-from processor import process_files
+from utils import clean_nan_values, clean_number_to_text, write_csv_file, zip_csv_files
+from processor import process_files, ProcessingCancelled, count_phone_occurrences, profile_log_phones, preview_removals
 from google_drive import GoogleDriveManager
+from upload_ledger import UploadLedger
+from occurrence_index import OccurrenceIndex
+from suppression_list import SuppressionList
+from worker import TaskWorker, CsvLoader
+from ingest import load_log_file, load_list_file
+from parse_cache import ParseCache
 from datetime import datetime
 import os
+import tempfile
+import itertools
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -21,10 +31,38 @@ class MainWindow(QMainWindow):
         self.list_file_name = None
         self.log_files = []
         self.log_filenames = []
+        self.log_load_times = []
         self.conditions = []
         
-        # Initialize Google Drive
-        self.drive_manager = GoogleDriveManager()
+        # List occurrence counts and log phone profiles behind the impact preview
+        self.list_occurrences = None
+        self.log_phone_profiles = []
+        
+        # Loaders of log file batches still being read
+        self.log_loaders = []
+        
+        # Initialize Google Drive; the ledger keeps unchanged results from being uploaded again
+        self.drive_manager = GoogleDriveManager(ledger=UploadLedger())
+        
+        # Format of the files uploaded to Google Drive: None (plain CSV), 'gzip', 'zstd' or 'parquet'
+        self.drive_compression = None
+        self.drive_compression_level = None
+        
+        # Occurrence counts kept across runs so growing list files are counted incrementally
+        self.occurrence_index = OccurrenceIndex()
+        
+        # Every number removed by an exported run; screening later runs against it is opt-in
+        self.suppression_list = SuppressionList()
+        
+        # Parsed and cleaned uploads, so re-uploading an unchanged file skips parsing
+        self.parse_cache = ParseCache()
+        
+        # Keep loaded frames compact: categoricals and Arrow-backed strings instead of objects
+        self.compact_frames = True
+        
+        # Background worker of the running stage, if any
+        self.worker = None
+        self.current_run = None
         
         # Create central widget and layout
         central_widget = QWidget()
@@ -93,12 +131,15 @@ class MainWindow(QMainWindow):
             # Clear the data lists
             self.log_files.clear()
             self.log_filenames.clear()
+            self.log_load_times.clear()
+            self.log_phone_profiles.clear()
             
             # Remove all widgets except the stretch at the end
             while self.log_files_layout.count() > 1:
                 item = self.log_files_layout.takeAt(0)
                 if item.widget():
                     item.widget().deleteLater()
+            self.update_preview()
     def setup_file_upload_section(self):
         upload_group = QWidget()
         upload_layout = QVBoxLayout(upload_group)
@@ -185,8 +226,11 @@ class MainWindow(QMainWindow):
         log_layout = QHBoxLayout(log_widget)
         log_layout.setContentsMargins(0, 0, 0, 0)
         
-        # Add file name label
-        file_label = QLabel(file_name)
+        # Add file name label with its size and load time
+        file_label = QLabel(
+            f"{file_name} ({len(self.log_files[index]):,} rows, "
+            f"loaded in {self.log_load_times[index]:.1f}s)"
+        )
         file_label.setStyleSheet("color: #28a745;")  # Success color
         log_layout.addWidget(file_label)
         
@@ -222,11 +266,14 @@ class MainWindow(QMainWindow):
             # Remove the file from both lists
             self.log_files.pop(index)
             self.log_filenames.pop(index)
+            self.log_load_times.pop(index)
+            self.log_phone_profiles.pop(index)
             # Remove the widget from layout
             widget.setParent(None)
             widget.deleteLater()
             # Update remaining widgets
             self._update_log_file_widgets()
+            self.update_preview()
 
     def _update_log_file_widgets(self):
         """Recreate all log file widgets to ensure proper indexing."""
@@ -252,37 +299,56 @@ class MainWindow(QMainWindow):
         )
         
         if file_names:
-            for file_path in file_names:
-                try:
-                    # Read CSV with optimized settings
-                    df = pd.read_csv(
-                        file_path,
-                        low_memory=False,
-                        encoding='utf-8',
-                        on_bad_lines='skip'
-                    )
-                    
-                    file_name = os.path.basename(file_path)
-                    self.log_files.append(df)
-                    self.log_filenames.append(file_name)
-                    
-                    # Create and add the log file widget
-                    log_widget = self._create_log_file_widget(
-                        file_name, 
-                        len(self.log_files) - 1
-                    )
-                    self.log_files_layout.insertWidget(
-                        self.log_files_layout.count() - 1, 
-                        log_widget
-                    )
-                    
-                except Exception as e:
-                    QMessageBox.critical(
-                        self, 
-                        "Error", 
-                        f"Error uploading {os.path.basename(file_path)}: {str(e)}"
-                    )
-
+            # Files are parsed concurrently and listed as soon as each one is ready
+            errors = []
+            loader = CsvLoader(self._read_log_file)
+            loader.loaded.connect(self._add_log_file)
+            loader.load_failed.connect(
+                lambda path, error: errors.append(f"{os.path.basename(path)}: {error}")
+            )
+            loader.finished.connect(lambda: self._log_files_loaded(loader, errors))
+            self.log_loaders.append(loader)
+            
+            self.status_label.setText(f"Loading {len(file_names)} log files...")
+            self.status_label.setStyleSheet("color: #007bff;")
+            loader.start(file_names)
+    
+    def _read_log_file(self, path):
+        """Load a log file and profile its phones for the impact preview; runs on a loader thread."""
+        df = load_log_file(path, self.parse_cache, self.compact_frames)
+        return df, profile_log_phones(df)
+    
+    def _add_log_file(self, file_path, loaded, load_seconds):
+        """Add a loaded log file and its widget."""
+        df, phone_profile = loaded
+        self.log_files.append(df)
+        self.log_filenames.append(os.path.basename(file_path))
+        self.log_load_times.append(load_seconds)
+        self.log_phone_profiles.append(phone_profile)
+        
+        # Create and add the log file widget
+        log_widget = self._create_log_file_widget(
+            self.log_filenames[-1], 
+            len(self.log_files) - 1
+        )
+        self.log_files_layout.insertWidget(
+            self.log_files_layout.count() - 1, 
+            log_widget
+        )
+        self.update_preview()
+    
+    def _log_files_loaded(self, loader, errors):
+        """Report the end of a batch, listing the files that could not be read."""
+        self.log_loaders.remove(loader)
+        self.status_label.setText(f"{len(self.log_files)} log files loaded")
+        self.status_label.setStyleSheet("color: #28a745;")
+        if errors:
+            QMessageBox.critical(
+                self, 
+                "Error", 
+                "Error uploading log files:\n\n" + "\n".join(errors)
+            )
+        
     def setup_conditions_section(self):
         conditions_group = QWidget()
         conditions_layout = QVBoxLayout(conditions_group)
@@ -326,6 +392,31 @@ class MainWindow(QMainWindow):
         conditions_scroll.setWidget(self.conditions_container)
         conditions_layout.addWidget(conditions_scroll)
         
+        # Numbers removed by earlier exported runs, removed again only when asked
+        history_widget = QWidget()
+        history_layout = QHBoxLayout(history_widget)
+        history_layout.setContentsMargins(0, 0, 0, 0)
+        
+        self.screen_history_checkbox = QCheckBox("Also remove numbers removed by earlier exported runs")
+        self.screen_history_checkbox.toggled.connect(lambda checked: self.update_preview())
+        history_layout.addWidget(self.screen_history_checkbox)
+        
+        self.clear_history_btn = QPushButton("Clear Removal History")
+        self.clear_history_btn.clicked.connect(self.clear_removal_history)
+        history_layout.addWidget(self.clear_history_btn)
+        
+        conditions_layout.addWidget(history_widget)
+        
+        # Impact preview of the current conditions, updated as they change
+        preview_title = QLabel("Impact Preview")
+        preview_title.setStyleSheet("font-weight: bold; color: #333333;")
+        conditions_layout.addWidget(preview_title)
+        
+        self.preview_label = QLabel()
+        self.preview_label.setWordWrap(True)
+        conditions_layout.addWidget(self.preview_label)
+        self.update_preview()
+        
         self.content_layout.addWidget(conditions_group)
 
     def add_condition(self):
@@ -354,6 +445,7 @@ class MainWindow(QMainWindow):
         # Clear inputs
         self.condition_type_input.clear()
         self.threshold_input.setValue(1)
+        self.update_preview()
 
     def _create_condition_widget(self, condition: dict) -> QWidget:
         """Create a widget for displaying a condition with remove button."""
@@ -389,6 +481,48 @@ class MainWindow(QMainWindow):
         """Remove a condition and its widget."""
         self.conditions.remove(condition)
         widget.deleteLater()
+        self.update_preview()
+    
+    def _screened_history(self):
+        """The suppression list when earlier runs' removals should be removed again, else None."""
+        return self.suppression_list if self.screen_history_checkbox.isChecked() else None
+    
+    def clear_removal_history(self):
+        """Forget the numbers removed by earlier runs, after confirmation."""
+        answer = QMessageBox.question(
+            self,
+            "Clear Removal History",
+            f"Forget the {len(self.suppression_list):,} numbers removed by earlier exported runs?"
+        )
+        if answer != QMessageBox.Yes:
+            return
+        self.suppression_list.clear()
+        self.update_preview()
+        self.status_label.setText("Removal history cleared")
+        self.status_label.setStyleSheet("color: #666666;")
+    
+    def update_preview(self):
+        """Show how many numbers and log rows the current conditions would remove, without processing."""
+        if self.list_occurrences is None or not self.conditions:
+            self.preview_label.setText("Upload a list file and add conditions to preview their impact.")
+            self.preview_label.setStyleSheet("color: #666666;")
+            return
+        
+        preview = preview_removals(
+            self.list_occurrences, self.conditions, self.log_phone_profiles,
+            self.log_filenames, self._screened_history()
+        )
+        summary = f"{preview['phones']:,} numbers would be removed"
+        if preview['by_type']:
+            summary += " (" + ", ".join(
+                f"{log_type}: {count:,}" for log_type, count in preview['by_type'].items()
+            ) + ")"
+        lines = [summary] + [
+            f"• {file['filename']}: {file['affected_rows']:,} of {file['rows']:,} rows affected"
+            for file in preview['files']
+        ]
+        self.preview_label.setText("\n".join(lines))
+        self.preview_label.setStyleSheet("color: #007bff;")
     def setup_process_section(self):
         process_group = QWidget()
         process_layout = QVBoxLayout(process_group)
@@ -404,9 +538,14 @@ class MainWindow(QMainWindow):
         self.progress_bar.hide()  # Initially hidden
         process_layout.addWidget(self.progress_bar)
         
-        process_btn = QPushButton("Process Files")
-        process_btn.clicked.connect(self.process_files)
-        process_layout.addWidget(process_btn)
+        self.process_btn = QPushButton("Process Files")
+        self.process_btn.clicked.connect(self.process_files)
+        process_layout.addWidget(self.process_btn)
+        
+        self.cancel_btn = QPushButton("Cancel")
+        self.cancel_btn.clicked.connect(self.cancel_processing)
+        self.cancel_btn.hide()  # Only shown while a run is in progress
+        process_layout.addWidget(self.cancel_btn)
         
         self.status_label = QLabel("")
         self.status_label.setStyleSheet("color: #666666;")
@@ -423,76 +562,164 @@ class MainWindow(QMainWindow):
             )
             return
         
-        try:
-            # Reset and show progress bar
-            self.progress_bar.show()
-            self.progress_bar.setValue(0)
-            
-            current_date = datetime.now().strftime("%Y%m%d")
-            
-            # Update progress for file processing start
-            self.update_progress(10, "Starting file processing...")
-            
-            # Process files
-            updated_list_df, updated_log_dfs, removed_log_records = process_files(
-                self.log_files, self.list_file, self.conditions, self.log_filenames
-            )
-            
-            # Update progress after processing
-            self.update_progress(40, "Files processed. Preparing to save removed records...")
-            
-            # Save removed records
-            removed_save_path = self._save_removed_records(
-                updated_list_df, removed_log_records, current_date
+        # Reset and show progress bar
+        self.progress_bar.show()
+        self.progress_bar.setValue(0)
+        self._set_running(True)
+        
+        # Snapshot the inputs so edits made while the run is going do not affect it
+        self.current_run = {
+            'date': datetime.now().strftime("%Y%m%d"),
+            'list_file_name': self.list_file_name,
+            'log_filenames': list(self.log_filenames),
+        }
+        log_files = list(self.log_files)
+        list_file = self.list_file
+        conditions = [dict(condition) for condition in self.conditions]
+        suppression_list = self._screened_history()
+        
+        def keep_removals(phones_to_remove):
+            # Recorded in the suppression list only once the results are exported
+            self.current_run['removals'] = phones_to_remove
+        
+        # Update progress for file processing start
+        self.update_progress(10, "Starting file processing...")
+        
+        def run(progress, cancel_event):
+            return process_files(
+                log_files, list_file, conditions, self.current_run['log_filenames'],
+                workers=os.cpu_count(),
+                occurrence_index=self.occurrence_index,
+                list_source=self.current_run['list_file_name'],
+                suppression_list=suppression_list,
+                on_removals=keep_removals,
+                progress=progress,
+                cancel_event=cancel_event,
+                # Outputs are built block by block while their CSVs are written
+                lazy=True,
+                # Logs are cleaned when they are loaded
+                cleaned=True
             )
-            
-            # Update progress after saving removed records
-            self.update_progress(60, "Saving scrubbed files...")
-            
-            # Save scrubbed files
-            scrubbed_save_path = self._save_scrubbed_files(
-                updated_log_dfs, current_date
+        
+        self._start_worker(run, self._processing_finished, self._processing_progress)
+    
+    def _start_worker(self, fn, on_finished, on_progress):
+        """Run fn(progress, cancel_event) on a background thread."""
+        if self.worker is not None:
+            self.worker.wait()
+        
+        self.worker = TaskWorker(fn)
+        self.worker.progress.connect(on_progress)
+        self.worker.finished.connect(on_finished)
+        self.worker.failed.connect(self._worker_failed)
+        self.worker.cancelled.connect(self._worker_cancelled)
+        self.worker.start()
+    
+    def cancel_processing(self):
+        """Ask the running stage to stop at its next chunk or file."""
+        if self.worker is not None:
+            self.worker.cancel()
+            self.cancel_btn.setEnabled(False)
+            self.status_label.setText("Cancelling...")
+    
+    def _set_running(self, running):
+        self.process_btn.setEnabled(not running)
+        self.clear_history_btn.setEnabled(not running)
+        self.cancel_btn.setEnabled(running)
+        self.cancel_btn.setVisible(running)
+        if not running:
+            # Hide progress bar after completion or error
+            self.progress_bar.hide()
+    
+    def _processing_progress(self, rows_done, rows_total, rows_per_second):
+        value = 10 + (60 * rows_done // rows_total if rows_total else 60)
+        self.update_progress(
+            value,
+            f"Scrubbing log files: {rows_done:,} of {rows_total:,} rows ({rows_per_second:,.0f} rows/s)"
+        )
+    
+    def _processing_finished(self, result):
+        """Ask where to save the ZIPs, then encode, save and upload in the background."""
+        current_date = self.current_run['date']
+        self.update_progress(70, "Files processed. Choose where to save the results...")
+        
+        removed_save_path, _ = QFileDialog.getSaveFileName(
+            self,
+            "Save Removed Records",
+            f"removed_records_{current_date}.zip",
+            "ZIP Files (*.zip)"
+        )
+        scrubbed_save_path, _ = QFileDialog.getSaveFileName(
+            self,
+            "Save Scrubbed Files",
+            f"scrubbed_files_{current_date}.zip",
+            "ZIP Files (*.zip)"
+        )
+        
+        def export(progress, cancel_event):
+            return self._export_results(
+                result, removed_save_path, scrubbed_save_path, progress, cancel_event
             )
-            
-            # Update progress before Google Drive upload
-            self.update_progress(80, "Uploading to Google Drive...")
-            
-            # Upload to Google Drive
-            try:
-                self.upload_to_drive(
-                    updated_list_df, 
-                    updated_log_dfs, 
-                    removed_log_records, 
-                    current_date
-                )
-                self.update_progress(100, "Files processed and uploaded successfully!")
-            except Exception as e:
-                self.update_progress(90, "Files processed but failed to upload to Google Drive")
-                QMessageBox.warning(
-                    self, 
-                    "Warning", 
-                    f"Files processed successfully but failed to upload to Google Drive: {str(e)}"
-                )
-            
-            # Show success message
-            self.status_label.setStyleSheet("color: #28a745;")
-            QMessageBox.information(
+        
+        self._start_worker(export, self._export_finished, self._export_progress)
+    
+    def _export_progress(self, files_done, files_total, files_per_second):
+        value = 70 + (30 * files_done // files_total if files_total else 30)
+        self.update_progress(value, f"Saving and uploading results: {files_done} of {files_total} files")
+    
+    def _export_finished(self, outcome):
+        for error in outcome['errors']:
+            QMessageBox.critical(self, "Error", error)
+        
+        if not outcome['drive_errors']:
+            message = "Files processed and uploaded successfully!"
+            if outcome['drive_skipped']:
+                message += f" ({outcome['drive_skipped']} unchanged files already on Google Drive)"
+            if outcome['drive_copied']:
+                message += f" ({outcome['drive_copied']} copied on Google Drive from identical files)"
+            self.update_progress(100, message)
+        else:
+            self.update_progress(90, "Files processed but some uploads to Google Drive failed")
+            QMessageBox.warning(
                 self, 
-                "Success",
-                "Files processed and saved successfully!\n\n"
-                "• Removed records: " + 
-                (os.path.basename(removed_save_path) if removed_save_path else "Not saved") +
-                "\n• Scrubbed files: " + 
-                (os.path.basename(scrubbed_save_path) if scrubbed_save_path else "Not saved")
+                "Warning", 
+                "Files processed successfully but these files failed to upload to Google Drive:\n\n"
+                + "\n".join(outcome['drive_errors'])
             )
-            
-        except Exception as e:
-            self.status_label.setText(f"Error: {str(e)}")
-            self.status_label.setStyleSheet("color: #dc3545;")
-            QMessageBox.critical(self, "Error", f"Error processing files: {str(e)}")
-        finally:
-            # Hide progress bar after completion or error
-            self.progress_bar.hide()
+        
+        # Show success message
+        removed_save_path = outcome['removed_save_path']
+        scrubbed_save_path = outcome['scrubbed_save_path']
+        self.status_label.setStyleSheet("color: #28a745;")
+        self._set_running(False)
+        QMessageBox.information(
+            self, 
+            "Success",
+            "Files processed and saved successfully!\n\n"
+            "• Removed records: " + 
+            (os.path.basename(removed_save_path) if removed_save_path else "Not saved") +
+            "\n• Scrubbed files: " + 
+            (os.path.basename(scrubbed_save_path) if scrubbed_save_path else "Not saved")
+        )
+    
+    def _worker_failed(self, message):
+        self._set_running(False)
+        self.status_label.setText(f"Error: {message}")
+        self.status_label.setStyleSheet("color: #dc3545;")
+        QMessageBox.critical(self, "Error", f"Error processing files: {message}")
+    
+    def _worker_cancelled(self):
+        self._set_running(False)
+        self.status_label.setText("Processing cancelled")
+        self.status_label.setStyleSheet("color: #666666;")
+    
+    def closeEvent(self, event):
+        # Let a running stage stop before the window goes away
+        if self.worker is not None:
+            self.worker.cancel()
+            self.worker.wait()
+        super().closeEvent(event)
+    
     def update_progress(self, value, message=""):
         """Update progress bar value and message."""
         self.progress_bar.show()
@@ -500,7 +727,6 @@ class MainWindow(QMainWindow):
         if message:
             self.status_label.setText(message)
             self.status_label.setStyleSheet("color: #007bff;")
-    QApplication.processEvents()
     def upload_list_file(self):
         """Handle the upload of a list file (CSV)."""
         file_name, _ = QFileDialog.getOpenFileName(
@@ -512,13 +738,9 @@ class MainWindow(QMainWindow):
         
         if file_name:
             try:
-                # Read CSV with optimized settings
-                self.list_file = pd.read_csv(
-                    file_name,
-                    low_memory=False,
-                    encoding='utf-8',
-                    on_bad_lines='skip'
-                )
+                # Only the Phone and Log Type columns are read
+                self.list_file = load_list_file(file_name, self.parse_cache, self.compact_frames)
+                self.list_occurrences = count_phone_occurrences(self.list_file)
                 self.list_file_name = os.path.splitext(os.path.basename(file_name))[0]
                 self.list_file_label.setText(f"List file uploaded: {self.list_file_name}")
                 self.list_file_label.setStyleSheet("color: #28a745;")
@@ -529,92 +751,120 @@ class MainWindow(QMainWindow):
                 self.list_file_label.setStyleSheet("color: #dc3545;")
                 self.list_file = None
                 self.list_file_name = None
-    def _save_removed_records(self, updated_list_df, removed_log_records, current_date):
-        """Save removed records to a ZIP file."""
-        removed_dfs = {
-            f'Updated_List_File_{current_date}': updated_list_df
+                self.list_occurrences = None
+            self.update_preview()
+    def _export_results(self, result, removed_save_path, scrubbed_save_path, progress, cancel_event):
+        """Encode the results once, write the chosen ZIPs and upload to Google Drive.
+        
+        Runs on the worker thread, so problems are collected in the returned
+        outcome and reported by _export_finished.
+        """
+        outcome = {
+            'removed_save_path': None,
+            'scrubbed_save_path': None,
+            'errors': [],
+            'drive_errors': [],
+            'drive_skipped': 0,
+            'drive_copied': 0,
         }
         
-        for i, log_file_name in enumerate(self.log_filenames):
-            if not removed_log_records[i].empty:
-                base_name = os.path.splitext(log_file_name)[0]  # Keep original name with spaces/dashes
-                removed_dfs[f'Removed_Records_{base_name}_{current_date}'] = removed_log_records[i]
-        
-        if removed_dfs:
-            save_path, _ = QFileDialog.getSaveFileName(
-                self,
-                "Save Removed Records",
-                f"removed_records_{current_date}.zip",
-                "ZIP Files (*.zip)"
-            )
+        # Encode every output file once; the ZIPs and Google Drive get the same bytes
+        with tempfile.TemporaryDirectory(prefix='log_processor_export_') as export_dir:
+            exports = self._export_entries(*result)
+            files_total = 2 * len(exports)
+            for i, export in enumerate(exports):
+                if cancel_event.is_set():
+                    raise ProcessingCancelled("Export was cancelled")
+                export['path'] = write_csv_file(export.pop('df'), os.path.join(export_dir, f'{i}.csv'))
+                progress(i + 1, files_total)
             
-            if save_path:
+            for group, save_path, label in (
+                ('removed', removed_save_path, 'removed records'),
+                ('scrubbed', scrubbed_save_path, 'scrubbed files'),
+            ):
+                if not save_path:
+                    continue
                 try:
-                    zip_data = create_zip_file(removed_dfs)
-                    with open(save_path, 'wb') as f:
-                        f.write(zip_data)
-                    return save_path
+                    zip_csv_files({e['zip_name']: e['path'] for e in exports if e['group'] == group}, save_path)
+                    outcome[f'{group}_save_path'] = save_path
                 except Exception as e:
-                    QMessageBox.critical(self, "Error", f"Error saving removed records: {str(e)}")
-        
-        return None
-
-    def _save_scrubbed_files(self, updated_log_dfs, current_date):
-        """Save scrubbed files to a ZIP file."""
-        scrubbed_dfs = {}
-        
-        for i, log_file_name in enumerate(self.log_filenames):
-            base_name = os.path.splitext(log_file_name)[0]  # Keep original name with spaces/dashes
-            scrubbed_dfs[f'Scrubbed_{base_name}_{current_date}'] = updated_log_dfs[i]
-        
-        if scrubbed_dfs:
-            save_path, _ = QFileDialog.getSaveFileName(
-                self,
-                "Save Scrubbed Files",
-                f"scrubbed_files_{current_date}.zip",
-                "ZIP Files (*.zip)"
-            )
+                    outcome['errors'].append(f"Error saving {label}: {str(e)}")
             
-            if save_path:
-                try:
-                    zip_data = create_zip_file(scrubbed_dfs)
-                    with open(save_path, 'wb') as f:
-                        f.write(zip_data)
-                    return save_path
-                except Exception as e:
-                    QMessageBox.critical(self, "Error", f"Error saving scrubbed files: {str(e)}")
-        
-        return None
-    def upload_to_drive(self, updated_list_df, updated_log_dfs, removed_log_records, current_date):
-        """Upload files to Google Drive."""
-        # Upload updated list file
-        self.drive_manager.upload_dataframe(
-            updated_list_df,
-            f"Updated_{self.list_file_name}_{current_date}.csv",
-            self.drive_manager.REMOVED_FOLDER_ID
-        )
-        
-        # Upload log files and removed records
-        for i, log_file_name in enumerate(self.log_filenames):
-            base_name = os.path.splitext(log_file_name)[0]
+            # Upload to Google Drive, several files at a time; a failed file does not stop the rest
+            files_done = itertools.count(len(exports) + 1)
+            results = self.upload_to_drive(
+                exports, cancel_event, lambda result: progress(next(files_done), files_total),
+                compression=self.drive_compression, level=self.drive_compression_level
+            )
             
-            # Upload scrubbed log file
-            self.drive_manager.upload_dataframe(
-                updated_log_dfs[i],
-                f"Scrubbed_{base_name}_{current_date}.csv",
-                self.drive_manager.SCRUBBED_FOLDER_ID
+            # Only removals that reached a saved ZIP or Google Drive are remembered for later runs
+            exported = outcome['removed_save_path'] or outcome['scrubbed_save_path'] or any(
+                result['file_id'] is not None for result in results
             )
+            if exported and self.current_run.get('removals') is not None:
+                self.suppression_list.add(self.current_run['removals'])
             
-            # Upload removed records if they exist
+            if cancel_event.is_set():
+                raise ProcessingCancelled("Upload was cancelled")
+            outcome['drive_errors'] = [
+                f"{result['filename']}: {result['error']}" for result in results if result['error']
+            ]
+            outcome['drive_skipped'] = sum(result['action'] == 'skipped' for result in results)
+            outcome['drive_copied'] = sum(result['action'] == 'copied' for result in results)
+        
+        return outcome
+
+    def _export_entries(self, updated_list_df, updated_log_dfs, removed_log_records):
+        """One entry per output file with its group ('removed' or 'scrubbed'),
+        its name inside the ZIP, its name on Google Drive and its DataFrame.
+        """
+        current_date = self.current_run['date']
+        exports = [{
+            'group': 'removed',
+            'zip_name': f'Updated_List_File_{current_date}',
+            'drive_name': f"Updated_{self.current_run['list_file_name']}_{current_date}.csv",
+            'df': updated_list_df
+        }]
+        
+        for i, log_file_name in enumerate(self.current_run['log_filenames']):
+            base_name = os.path.splitext(log_file_name)[0]  # Keep original name with spaces/dashes
+            exports.append({
+                'group': 'scrubbed',
+                'zip_name': f'Scrubbed_{base_name}_{current_date}',
+                'drive_name': f"Scrubbed_{base_name}_{current_date}.csv",
+                'df': updated_log_dfs[i]
+            })
             if not removed_log_records[i].empty:
-                self.drive_manager.upload_dataframe(
-                    removed_log_records[i],
-                    f"Removed_Records_{base_name}_{current_date}.csv",
-                    self.drive_manager.REMOVED_FOLDER_ID
-                )
+                exports.append({
+                    'group': 'removed',
+                    'zip_name': f'Removed_Records_{base_name}_{current_date}',
+                    'drive_name': f"Removed_Records_{base_name}_{current_date}.csv",
+                    'df': removed_log_records[i]
+                })
+        return exports
+
+    def upload_to_drive(self, exports, cancel_event=None, on_done=None, compression=None, level=None):
+        """Upload encoded output files to Google Drive concurrently; returns one result per file.
+        
+        compression ('gzip', 'zstd' or 'parquet') and level are passed on to
+        GoogleDriveManager.upload_csv_files.
+        """
+        uploads = [
+            (
+                export['path'],
+                export['drive_name'],
+                self.drive_manager.REMOVED_FOLDER_ID if export['group'] == 'removed'
+                else self.drive_manager.SCRUBBED_FOLDER_ID
+            )
+            for export in exports
+        ]
+        return self.drive_manager.upload_csv_files(uploads, cancel_event, on_done, compression, level)
 
 
 def main():
+    # Needed for the processing pool in the frozen (PyInstaller) builds
+    multiprocessing.freeze_support()
+    
     app = QApplication(sys.argv)
     app.setStyle("Fusion")
     
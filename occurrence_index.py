@@ -0,0 +1,108 @@
+import os
+import hashlib
+import pandas as pd
+from processor import count_phone_occurrences, find_phones_to_remove
+from sqlite_store import SQLiteStore, DATA_DIRECTORY
+
+class OccurrenceIndex(SQLiteStore):
+    """On-disk (Log Type, Phone) occurrence counts, updated incrementally per list file.
+
+    Counts are kept per source (the list file name) together with how many of
+    its rows were already counted and a fingerprint of those rows. As long as
+    a list file only grows by appending, each update counts just the new rows.
+    """
+    DEFAULT_PATH = os.path.join(DATA_DIRECTORY, 'occurrence_index.sqlite3')
+    # Bumped whenever the stored representation changes; older indexes are rebuilt
+    SCHEMA_VERSION = 2
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS sources (
+            source TEXT PRIMARY KEY,
+            rows INTEGER NOT NULL,
+            fingerprint TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS counts (
+            source TEXT NOT NULL,
+            log_type TEXT NOT NULL,
+            phone INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            seq INTEGER NOT NULL,
+            PRIMARY KEY (source, log_type, phone)
+        );
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        super().__init__(path)
+
+    @staticmethod
+    def _fingerprint(cleaned_list_df, rows):
+        """Hash the Phone and Log Type values of the first `rows` rows."""
+        hashes = pd.util.hash_pandas_object(
+            cleaned_list_df[['Phone', 'Log Type']].iloc[:rows], index=False
+        )
+        return hashlib.sha1(hashes.to_numpy().tobytes()).hexdigest()
+
+    def update(self, source, cleaned_list_df):
+        """Count the rows of a cleaned list file not yet in the index; returns how many were counted."""
+        total_rows = len(cleaned_list_df)
+
+        with self._connect() as conn, conn:
+            known = conn.execute(
+                "SELECT rows, fingerprint FROM sources WHERE source = ?", (source,)
+            ).fetchone()
+
+            counted_rows = 0
+            next_seq = 0
+            if known is not None:
+                rows, fingerprint = known
+                # Reuse the stored counts only if those rows are still unchanged
+                if rows <= total_rows and self._fingerprint(cleaned_list_df, rows) == fingerprint:
+                    counted_rows = rows
+                    next_seq = conn.execute(
+                        "SELECT COALESCE(MAX(seq) + 1, 0) FROM counts WHERE source = ?", (source,)
+                    ).fetchone()[0]
+                else:
+                    conn.execute("DELETE FROM counts WHERE source = ?", (source,))
+
+            if counted_rows and counted_rows == total_rows:
+                return 0
+
+            # New pairs are numbered after the existing ones to keep first-seen order
+            new_counts = count_phone_occurrences(cleaned_list_df.iloc[counted_rows:])
+            conn.executemany(
+                """
+                INSERT INTO counts (source, log_type, phone, count, seq) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (source, log_type, phone) DO UPDATE SET count = count + excluded.count
+                """,
+                zip(
+                    [source] * len(new_counts),
+                    new_counts['Log Type'].tolist(),
+                    new_counts['Phone'].tolist(),
+                    new_counts['Count'].tolist(),
+                    range(next_seq, next_seq + len(new_counts))
+                )
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO sources (source, rows, fingerprint) VALUES (?, ?, ?)",
+                (source, total_rows, self._fingerprint(cleaned_list_df, total_rows))
+            )
+
+        return total_rows - counted_rows
+
+    def phones_to_remove(self, source, conditions):
+        """Apply the conditions to the stored counts of a source, as find_phones_to_remove does."""
+        # Only pairs meeting a condition are read back from disk
+        clauses = ' OR '.join(['(log_type = ? AND count >= ?)'] * len(conditions)) or '0'
+        params = [source]
+        for cond in conditions:
+            params.extend([cond['type'], cond['threshold']])
+
+        with self._connect() as conn:
+            matches = pd.read_sql_query(
+                f"""
+                SELECT log_type AS "Log Type", phone AS "Phone", count AS "Count"
+                FROM counts WHERE source = ? AND ({clauses}) ORDER BY seq
+                """,
+                conn,
+                params=params
+            )
+        return find_phones_to_remove(matches, conditions)
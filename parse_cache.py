@@ -0,0 +1,162 @@
+import os
+import json
+import uuid
+import hashlib
+import pandas as pd
+from sqlite_store import DATA_DIRECTORY
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+# Parquet schema metadata key listing the columns stored by _encode_blanks
+BLANK_COLUMNS_KEY = b'log_processor.blank_columns'
+
+# Cell types of cleaned columns that mix values with '' blanks, and the
+# nullable dtype they are stored as
+BLANK_FILLED_DTYPES = {'floating': 'float64', 'integer': 'Int64', 'boolean': 'boolean'}
+
+def _encode_blanks(df):
+    """Store columns mixing numbers or booleans with '' blanks as nullable columns.
+
+    clean_nan_values turns the missing cells of numeric and boolean columns
+    into '', leaving object columns Parquet cannot hold. Their blanks become
+    nulls here and _decode_blanks puts them back. Returns the frame to store
+    and {column: was categorical} for the columns changed.
+    """
+    encoded = {}
+    for col in df.columns:
+        values = df[col]
+        categorical = isinstance(values.dtype, pd.CategoricalDtype)
+        if categorical:
+            if values.cat.categories.dtype != object:
+                continue
+            values = values.astype(object)
+        elif values.dtype != object:
+            continue
+        blank = (values == '').to_numpy(dtype=bool)
+        if not blank.any() or blank.all():
+            continue
+        kind = pd.api.types.infer_dtype(values[~blank], skipna=False)
+        if kind not in BLANK_FILLED_DTYPES:
+            continue
+        if not encoded:
+            df = df.copy(deep=False)
+        df[col] = values.mask(blank).astype(BLANK_FILLED_DTYPES[kind])
+        encoded[col] = categorical
+    return df, encoded
+
+def _decode_blanks(df, encoded):
+    """Undo _encode_blanks: nulls back to '' in object (or categorical) columns.
+
+    Arrow-backed text columns, which read_parquet returns as Python-backed
+    strings, are made Arrow-backed again.
+    """
+    for col in df.columns:
+        dtype = df[col].dtype
+        if isinstance(dtype, pd.StringDtype) and dtype.storage == 'python':
+            df[col] = df[col].astype(pd.StringDtype('pyarrow'))
+    for col, categorical in encoded.items():
+        values = df[col]
+        values = values.astype(object).where(values.notna(), '')
+        df[col] = values.astype('category') if categorical else values
+    return df
+
+class ParseCache:
+    """Parsed and cleaned input frames stored as Parquet files, keyed by file content.
+
+    The key is a hash of the source file's bytes, the kind of file and
+    CACHE_VERSION, so re-uploading an unchanged file skips parsing and
+    cleaning. Hits refresh a file's modification time and the least recently
+    used files are deleted once the cache holds more than max_bytes. hits and
+    misses count the loads served from and stored to the cache.
+    """
+    DEFAULT_DIRECTORY = os.path.join(DATA_DIRECTORY, 'parse_cache')
+    # Bumped whenever reading or cleaning changes what a cached frame holds
+    CACHE_VERSION = 2
+
+    def __init__(self, directory=DEFAULT_DIRECTORY, max_bytes=2 * 1024 ** 3):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, path, kind):
+        """Hash of the cache version, the kind of file and the file content."""
+        digest = hashlib.sha256(f"{self.CACHE_VERSION}:{kind}:".encode('utf-8'))
+        with open(path, 'rb') as source:
+            for block in iter(lambda: source.read(1024 * 1024), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def _cache_path(self, key):
+        return os.path.join(self.directory, f"{key}.parquet")
+
+    def load(self, path, kind, read_fn):
+        """Cached frame of a source file, or read_fn(path) stored for the next time."""
+        if not PARQUET_AVAILABLE:
+            return read_fn(path)
+
+        cache_path = self._cache_path(self.key(path, kind))
+        if os.path.exists(cache_path):
+            try:
+                df = pd.read_parquet(cache_path)
+                metadata = pq.read_schema(cache_path).metadata or {}
+                df = _decode_blanks(df, json.loads(metadata.get(BLANK_COLUMNS_KEY, b'{}')))
+                # Mark as recently used
+                os.utime(cache_path)
+                self.hits += 1
+                return df
+            except Exception as e:
+                print(f"Ignoring unreadable cache entry for {os.path.basename(path)}: {e}")
+
+        df = read_fn(path)
+        self.misses += 1
+        self._store(cache_path, df)
+        return df
+
+    def _store(self, cache_path, df):
+        # Written under a temporary name so concurrent loads never see half a file
+        temp_path = f"{cache_path}.{uuid.uuid4().hex}.tmp"
+        try:
+            stored, encoded = _encode_blanks(df)
+            table = pa.Table.from_pandas(stored)
+            table = table.replace_schema_metadata({
+                **(table.schema.metadata or {}),
+                BLANK_COLUMNS_KEY: json.dumps(encoded).encode('utf-8')
+            })
+            pq.write_table(table, temp_path)
+            os.replace(temp_path, cache_path)
+        except Exception as e:
+            # Frames Parquet cannot hold (e.g. text mixed with numbers) are simply not cached
+            print(f"Could not cache parsed file: {e}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+        self.evict()
+
+    def evict(self):
+        """Delete the least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.parquet'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+            total -= size
@@ -1,6 +1,7 @@
 import pandas as pd
-from collections import defaultdict
-from utils import clean_nan_values, clean_number_to_text, clean_number
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from utils import clean_nan_values, clean_number_to_text, clean_number, LazyFrame
 def normalize_phone(value):
     """Convert any phone number format to a consistent string format."""
     if pd.isna(value) or value == '' or value is None:
@@ -20,6 +21,145 @@ def normalize_phone(value):
     except:
         return ''
 
+def _digits_only(texts, block_size=65536):
+    """Strip every non-digit character from an array of strings."""
+    texts = np.asarray(texts, dtype=object)
+    result = np.empty(len(texts), dtype=object)
+    
+    for start in range(0, len(texts), block_size):
+        # View the block as a (rows x chars) matrix of code points and pack the
+        # ASCII digits of each row to the front, zero padding the rest
+        wide = texts[start:start + block_size].astype(str)
+        width = max(wide.dtype.itemsize // 4, 1)
+        wide = wide.astype(f'U{width}')
+        chars = wide.view(np.uint32).reshape(len(wide), width)
+        is_digit = (chars >= 48) & (chars <= 57)
+        rows, cols = np.nonzero(is_digit)
+        positions = np.cumsum(is_digit, axis=1, dtype=np.int32)[rows, cols] - 1
+        packed = np.zeros_like(chars)
+        packed[rows, positions] = chars[rows, cols]
+        block = packed.view(wide.dtype).ravel().astype(object)
+        
+        # str.isdigit also accepts non-ASCII digits, so defer to the scalar version there
+        for i in np.flatnonzero((chars > 127).any(axis=1)):
+            block[i] = normalize_phone(texts[start + i])
+        result[start:start + block_size] = block
+    return result
+
+def _normalize_float_values(values):
+    """Normalize float phone values the way normalize_phone does (str(int(value)))."""
+    values = np.asarray(values, dtype='float64')
+    result = np.full(len(values), '', dtype=object)
+    
+    # int() truncates toward zero, so the digits of int(x) are those of int(abs(x))
+    exact = np.isfinite(values) & (np.abs(values) < 2 ** 63)
+    result[exact] = np.abs(values[exact]).astype('int64').astype(str)
+    for i in np.flatnonzero(~exact):
+        result[i] = normalize_phone(values[i])
+    return result
+
+def _normalize_unique_values(uniques):
+    """Normalize the distinct (non-null) values of a phone column."""
+    if len(uniques) == 0:
+        return np.array([], dtype=object)
+    
+    dtype = uniques.dtype
+    if pd.api.types.is_bool_dtype(dtype):
+        return np.asarray(uniques, dtype='int64').astype(str).astype(object)
+    if pd.api.types.is_float_dtype(dtype):
+        return _normalize_float_values(uniques)
+    if pd.api.types.is_integer_dtype(dtype):
+        return _digits_only(np.asarray(uniques).astype(str))
+    
+    values = np.asarray(uniques, dtype=object)
+    if pd.api.types.infer_dtype(values, skipna=False) == 'string':
+        return _digits_only(values)
+    
+    # Mixed object column (e.g. floats left next to '' by clean_nan_values):
+    # split the distinct values by Python type and normalize each group.
+    kinds = pd.Series(values).map(type)
+    kind_set = kinds.unique()
+    float_kinds = [k for k in kind_set if issubclass(k, float)]
+    int_kinds = [k for k in kind_set if issubclass(k, int)]
+    
+    result = np.empty(len(values), dtype=object)
+    is_float = kinds.isin(float_kinds).to_numpy()
+    is_int = kinds.isin(int_kinds).to_numpy()
+    is_text = ~(is_float | is_int)
+    
+    if is_float.any():
+        result[is_float] = _normalize_float_values(values[is_float])
+    if is_int.any():
+        result[is_int] = [normalize_phone(v) for v in values[is_int]]
+    if is_text.any():
+        result[is_text] = _digits_only(values[is_text].astype(str))
+    return result
+
+def normalize_phone_series(series):
+    """Vectorized normalize_phone for a whole column, computed once per distinct value."""
+    if series.empty:
+        return series.apply(normalize_phone)
+    
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    normalized = np.append(_normalize_unique_values(uniques), '')
+    
+    # Null values get code -1, which picks the trailing '' entry
+    if isinstance(series.dtype, pd.StringDtype):
+        # Compact string columns stay compact
+        normalized = pd.array(normalized, dtype=series.dtype).take(codes)
+        return pd.Series(normalized, index=series.index, name=series.name)
+    return pd.Series(normalized[codes], index=series.index, name=series.name, dtype=object)
+
+# Longest number that still fits an int64 phone key
+MAX_KEY_DIGITS = 18
+
+def _phones_to_keys(phones):
+    """Canonical int64 keys of an array of normalized phone strings (0 = no valid phone)."""
+    keys = np.zeros(len(phones), dtype=np.int64)
+    if len(phones) == 0:
+        return keys
+    
+    # Work on the (rows x chars) matrix of code points; normalized phones hold digits only
+    digits = np.asarray(phones, dtype=object).astype(str)
+    chars = digits.view(np.uint32).reshape(len(digits), -1)
+    lengths = np.count_nonzero(chars, axis=1)
+    
+    # Drop the leading country code 1 from long numbers, as clean_number does
+    has_country_code = (lengths > 10) & (chars[:, 0] == ord('1'))
+    canonical_lengths = lengths - has_country_code
+    ascii_digits = (chars <= 127).all(axis=1)
+    valid = (lengths >= 7) & (canonical_lengths <= MAX_KEY_DIGITS) & ascii_digits
+    
+    # Read each valid number as an integer; at most MAX_KEY_DIGITS + 1 characters
+    numbers = chars[valid, :MAX_KEY_DIGITS + 1].astype(np.int64) - ord('0')
+    valid_lengths = lengths[valid]
+    values = np.zeros(len(numbers), dtype=np.int64)
+    for i in range(numbers.shape[1]):
+        inside = i < valid_lengths
+        values[inside] = values[inside] * 10 + numbers[inside, i]
+    
+    # A leading 1 is added so numbers with leading zeros keep distinct keys; a
+    # dropped country code 1 already is that leading 1
+    keys[valid] = np.where(
+        has_country_code[valid], values, values + np.power(10, canonical_lengths[valid], dtype=np.int64)
+    )
+    return keys
+
+def normalized_phone_keys(series):
+    """Canonical int64 key of each phone in a normalized column, 0 where there is no valid phone.
+    
+    The column must hold normalized phone text (see normalize_phone_series),
+    as every cleaned frame does, so it is not normalized again. The key is
+    the number, minus a leading country code 1 on numbers longer than 10
+    digits, read as an integer behind an extra leading 1. Numbers longer than
+    MAX_KEY_DIGITS or with non-ASCII digits get no key.
+    """
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    keys = np.append(_phones_to_keys(np.asarray(uniques, dtype=object)), 0)
+    
+    # Null values get code -1, which picks the trailing 0 entry
+    return keys[codes]
+
 def is_valid_phone(value):
     """Validate if a phone number is valid."""
     if pd.isna(value) or value == '' or value is None:
@@ -43,104 +183,510 @@ def convert_phone_columns_to_string(df):
     """Convert all phone number columns to string format."""
     phone_cols = get_phone_columns(df)
     for col in phone_cols:
-        df[col] = df[col].apply(normalize_phone)
+        df[col] = normalize_phone_series(df[col])
     return df
 
-def process_files(log_dfs, list_df, conditions, log_filenames):
-    """Process files with consistent phone number handling."""
-    # Initial cleanup and type conversion
+def count_phone_occurrences(list_df):
+    """Count valid phones per log type in the cleaned list file.
+    
+    Returns a DataFrame with 'Log Type', 'Phone' and 'Count' columns, one row
+    per pair in the order the pair first appears in the file. 'Phone' holds
+    phone keys (see normalized_phone_keys).
+    """
+    keys = normalized_phone_keys(list_df['Phone'])
+    
+    type_codes, log_types = pd.factorize(list_df['Log Type'], use_na_sentinel=False)
+    titled = np.array([str(log_type).title() for log_type in log_types], dtype=object)
+    title_codes, titled = pd.factorize(titled)
+    type_codes = title_codes[type_codes]
+    
+    # Only valid phones (at least 7 digits) have a key
+    valid = keys != 0
+    key_codes, unique_keys = pd.factorize(keys[valid])
+    key_count = max(len(unique_keys), 1)
+    
+    pair_keys = type_codes[valid].astype('int64') * key_count + key_codes
+    pair_codes, pairs = pd.factorize(pair_keys)
+    counts = np.bincount(pair_codes, minlength=len(pairs))
+    
+    return pd.DataFrame({
+        'Log Type': pd.Categorical.from_codes(pairs // key_count, categories=titled),
+        'Phone': unique_keys[pairs % key_count],
+        'Count': counts
+    })
+
+def find_phones_to_remove(occurrence_counts, conditions):
+    """Find the phones meeting a condition threshold.
+    
+    Returns one row per phone key with the 'Log Type' and 'Count' that
+    triggered it, sorted by 'Phone' for searchsorted lookups.
+    """
+    counts = occurrence_counts
+    matches = np.zeros(len(counts), dtype=bool)
+    for cond in conditions:
+        matches |= (
+            (counts['Log Type'] == cond['type']) & (counts['Count'] >= cond['threshold'])
+        ).to_numpy()
+    
+    # A phone hit under several log types keeps the last one seen
+    hits = counts[matches].drop_duplicates('Phone', keep='last')
+    return hits.sort_values('Phone').reset_index(drop=True)
+
+def _phone_key_matrix(df, phone_cols):
+    """Phone keys of the given (normalized) columns as a (rows x phone_cols) matrix."""
+    key_matrix = np.empty((len(df), len(phone_cols)), dtype=np.int64)
+    for i, col in enumerate(phone_cols):
+        key_matrix[:, i] = normalized_phone_keys(df[col])
+    return key_matrix
+
+def _match_phone_keys(key_matrix, removal_keys):
+    """Position of each key in the sorted removal_keys array, -1 where absent."""
+    if len(removal_keys) == 0:
+        return np.full(key_matrix.shape, -1, dtype=np.intp)
+    positions = np.searchsorted(removal_keys, key_matrix)
+    positions[positions == len(removal_keys)] = 0
+    return np.where(removal_keys[positions] == key_matrix, positions, -1)
+
+def build_removal_reasons(phone_values, codes, phone_cols, details):
+    """Build the Removal_Reason text for each row of a trigger code matrix.
+    
+    codes index into the details texts ("<log type> count: <count>") and
+    phone_values holds the phone cells of the same rows and columns.
+    """
+    reasons = np.full(len(codes), '', dtype=object)
+    for i, col in enumerate(phone_cols):
+        hit = codes[:, i] >= 0
+        if not hit.any():
+            continue
+        
+        texts = (
+            "Number " + phone_values[hit, i] + f" in column '{col}' exceeded "
+            + details[codes[hit, i]]
+        )
+        
+        # Reasons are joined in column order
+        joined = reasons[hit]
+        reasons[hit] = np.where(joined == '', texts, joined + ' | ' + texts)
+    return reasons
+
+def prepare_removal_lookup(phones_to_remove):
+    """Precompute the lookup arrays used to scrub frames against phones_to_remove.
+    
+    Each phone to remove costs one int64 key and one small detail code; the
+    "<log type> count: <count>" texts are shared between phones.
+    """
+    counts = phones_to_remove['Count'].to_numpy(dtype=np.int64)
+    type_codes, log_types = pd.factorize(phones_to_remove['Log Type'])
+    count_range = int(counts.max()) + 1 if len(counts) else 1
+    detail_codes, detail_keys = pd.factorize(type_codes * count_range + counts)
+    
+    return {
+        'keys': phones_to_remove['Phone'].to_numpy(dtype=np.int64),
+        'detail_codes': detail_codes,
+        'details': np.array(
+            [f"{log_types[key // count_range]} count: {key % count_range}" for key in detail_keys],
+            dtype=object
+        ),
+        'date': pd.Timestamp.now().strftime('%d/%m/%Y'),
+    }
+
+def _list_scrub_result(cleaned_list_df, lookup):
+    """ScrubResult of the list file, whose only phone column is 'Phone'.
+    
+    Like the logs, it is screened against the lookup's 'suppression' list.
+    """
+    codes, details = _removal_codes(cleaned_list_df, ['Phone'], lookup)
+    result = ScrubResult(['Phone'], lookup['date'])
+    result.add_segment(ScrubResult.make_segment(cleaned_list_df, codes, details))
+    return result
+
+def _add_suppressed_hits(key_matrix, codes, details, suppression_list):
+    """Extend trigger codes with phones removed by earlier runs.
+    
+    Only keys not already triggering are screened against the suppression
+    list; their details, marked as coming from an earlier run, are appended
+    after the current ones.
+    """
+    unscreened = (codes < 0) & (key_matrix != 0)
+    if not unscreened.any():
+        return codes, details
+    
+    history = suppression_list.lookup(np.unique(key_matrix[unscreened]))
+    if history.empty:
+        return codes, details
+    
+    history_lookup = prepare_removal_lookup(history)
+    positions = _match_phone_keys(key_matrix, history_lookup['keys'])
+    history_hits = unscreened & (positions >= 0)
+    history_codes = np.append(history_lookup['detail_codes'], -1)[positions] + len(details)
+    codes = np.where(history_hits, history_codes, codes)
+    return codes, np.concatenate([details, history_lookup['details'] + " in an earlier run"])
+
+def _removal_codes(log_df, phone_cols, lookup):
+    """Detail code of every phone cell (rows x phone_cols, -1 where kept) and the detail texts."""
+    key_matrix = _phone_key_matrix(log_df, phone_cols)
+    positions = _match_phone_keys(key_matrix, lookup['keys'])
+    # Position -1 (no match) picks the trailing -1 entry
+    codes = np.append(lookup['detail_codes'], -1)[positions]
+    details = lookup['details']
+    
+    if lookup.get('suppression') is not None:
+        codes, details = _add_suppressed_hits(key_matrix, codes, details, lookup['suppression'])
+    return codes, details
+
+class ScrubResult:
+    """The scrubbed and removed versions of one cleaned frame, kept as edits.
+    
+    Rather than two edited copies, it holds the cleaned frame (as one or more
+    row segments) and, for the rows with a number to remove, the detail code
+    of each phone cell. scrubbed() and removed() return LazyFrames that build
+    the output rows only when they are written out.
+    """
+    def __init__(self, phone_cols, date):
+        self.phone_cols = list(phone_cols)
+        self.date = date
+        self.segments = []
+    
+    @staticmethod
+    def make_segment(frame, codes, details):
+        """Segment of a frame: the frame, its rows with hits, their codes and the detail texts."""
+        hit_rows = np.flatnonzero((codes >= 0).any(axis=1))
+        return frame, hit_rows, codes[hit_rows], details
+    
+    def add_segment(self, segment):
+        """Append the next rows, as built by make_segment."""
+        self.segments.append(segment)
+    
+    @property
+    def columns(self):
+        return self.segments[0][0].columns
+    
+    @property
+    def removed_count(self):
+        return sum(len(hit_rows) for _, hit_rows, _, _ in self.segments)
+    
+    def _scrubbed_block(self, segment, start, stop):
+        frame, hit_rows, hit_codes, _ = segment
+        block = frame.iloc[start:stop].copy()
+        
+        # Blank every triggering number of the block in one masked assignment
+        low, high = np.searchsorted(hit_rows, [start, stop])
+        if high > low:
+            hits = np.zeros((len(block), len(self.phone_cols)), dtype=bool)
+            hits[hit_rows[low:high] - start] = hit_codes[low:high] >= 0
+            block[self.phone_cols] = block[self.phone_cols].mask(hits, '')
+        return block
+    
+    def _removed_block(self, segment, low, high):
+        frame, hit_rows, hit_codes, details = segment
+        codes = hit_codes[low:high]
+        
+        # Triggered records keeping ONLY their triggering numbers
+        block = frame.iloc[hit_rows[low:high]].copy()
+        block[self.phone_cols] = block[self.phone_cols].where(codes >= 0, '')
+        block['Removal_Reason'] = build_removal_reasons(
+            block[self.phone_cols].to_numpy(dtype=object), codes, self.phone_cols, details
+        )
+        block['Removal_Date'] = self.date
+        return block
+    
+    def scrubbed(self):
+        """The frame with every triggering number blanked."""
+        def blocks(chunk_rows):
+            for segment in self.segments:
+                rows = len(segment[0])
+                for start in range(0, rows, chunk_rows):
+                    yield self._scrubbed_block(segment, start, min(start + chunk_rows, rows))
+        
+        def frame():
+            parts = [self._scrubbed_block(segment, 0, len(segment[0])) for segment in self.segments]
+            return pd.concat(parts) if len(parts) > 1 else parts[0]
+        
+        rows = sum(len(segment[0]) for segment in self.segments)
+        return LazyFrame(self.columns, rows, blocks, frame)
+    
+    def removed(self):
+        """The triggered records with their Removal_Reason and Removal_Date."""
+        def blocks(chunk_rows):
+            for segment in self.segments:
+                for low in range(0, len(segment[1]), chunk_rows):
+                    yield self._removed_block(segment, low, low + chunk_rows)
+        
+        def frame():
+            if not self.phone_cols:
+                return pd.DataFrame(columns=self.columns)
+            parts = [
+                self._removed_block(segment, 0, len(segment[1]))
+                for segment in self.segments if len(segment[1])
+            ]
+            if not parts:
+                return self.segments[0][0].iloc[:0].copy()
+            return pd.concat(parts) if len(parts) > 1 else parts[0]
+        
+        columns = list(self.columns)
+        if self.removed_count:
+            columns += ['Removal_Reason', 'Removal_Date']
+        return LazyFrame(columns, self.removed_count, blocks, frame)
+
+def find_removal_targets(list_df, conditions, occurrence_index=None, list_source=None):
+    """Clean the list file and work out which phones meet the conditions.
+    
+    With an OccurrenceIndex, only the list rows it has not seen yet for
+    list_source are counted and the conditions run on the stored totals.
+    """
     cleaned_list_df = clean_nan_values(list_df)
     cleaned_list_df = convert_phone_columns_to_string(cleaned_list_df)
     
-    cleaned_log_dfs = []
-    for df in log_dfs:
-        cleaned_df = clean_nan_values(df)
-        cleaned_df = convert_phone_columns_to_string(cleaned_df)
-        cleaned_log_dfs.append(cleaned_df)
+    if occurrence_index is not None:
+        occurrence_index.update(list_source, cleaned_list_df)
+        return cleaned_list_df, occurrence_index.phones_to_remove(list_source, conditions)
     
     # Step 1: Count occurrences
-    occurrence_counter = defaultdict(int)
-    for _, row in cleaned_list_df.iterrows():
-        phone = normalize_phone(row['Phone'])
-        if is_valid_phone(phone):
-            key = (str(row['Log Type']).title(), phone)
-            occurrence_counter[key] += 1
+    occurrence_counts = count_phone_occurrences(cleaned_list_df)
     
     # Step 2: Identify phones to remove
-    phones_to_remove = {}
-    for (log_type, phone), count in occurrence_counter.items():
-        for cond in conditions:
-            if log_type == cond['type'] and count >= cond['threshold']:
-                phones_to_remove[phone] = (log_type, count)
+    phones_to_remove = find_phones_to_remove(occurrence_counts, conditions)
+    return cleaned_list_df, phones_to_remove
+
+def profile_log_phones(log_df):
+    """Phone cells of a cleaned log frame reduced to what a removal preview needs.
     
-    # Step 3: Process list DataFrame
-    list_df_scrubbed = cleaned_list_df.copy()
-    removed_from_list = cleaned_list_df.copy()
+    Returns a dict with the log's row count, its distinct phone 'keys' (see
+    normalized_phone_keys, sorted) and, for the rows holding any valid phone, a 'codes' matrix
+    (rows x phone columns) of each cell's index into those keys, -1 where the
+    cell has no valid phone. Built once per log; preview_removals then only
+    checks the distinct keys against each set of conditions.
+    """
+    phone_cols = get_phone_columns(log_df)
+    key_matrix = _phone_key_matrix(log_df, phone_cols)
+    # Sorted keys make the removal lookups of each preview much faster
+    codes, keys = pd.factorize(key_matrix.ravel(), sort=True)
+    codes = codes.reshape(key_matrix.shape).astype(np.int32)
     
-    removal_mask = cleaned_list_df['Phone'].apply(
-        lambda x: is_valid_phone(x) and normalize_phone(x) in phones_to_remove
-    )
+    # Key 0 (no valid phone) sorts first and never matches, so it maps to -1 as well
+    if len(keys) and keys[0] == 0:
+        codes -= 1
+        keys = keys[1:]
+    candidates = (codes >= 0).any(axis=1)
     
-    # Add removal reasons and prepare removed records
-    for idx in cleaned_list_df[removal_mask].index:
-        phone = normalize_phone(cleaned_list_df.at[idx, 'Phone'])
-        if phone in phones_to_remove:
-            log_type, count = phones_to_remove[phone]
-            removed_from_list.at[idx, 'Removal_Reason'] = f"Removed due to {log_type} count: {count}"
-            list_df_scrubbed.at[idx, 'Phone'] = ''
+    return {
+        'rows': len(log_df),
+        'keys': np.asarray(keys, dtype=np.int64),
+        'codes': codes[candidates],
+        # Suppression flags of the keys, with the suppression list and generation they were looked up at
+        'suppressed': None,
+        'suppressed_version': None,
+    }
+
+def _suppressed_keys(profile, suppression_list):
+    """Which keys of a log profile were removed by earlier runs, refreshed when the history changes."""
+    version = (id(suppression_list), suppression_list.generation)
+    if profile['suppressed_version'] != version:
+        history = suppression_list.lookup(profile['keys'])
+        profile['suppressed'] = np.isin(profile['keys'], history['Phone'].to_numpy(dtype=np.int64))
+        profile['suppressed_version'] = version
+    return profile['suppressed']
+
+def preview_removals(occurrence_counts, conditions, log_profiles, log_filenames, suppression_list=None):
+    """Dry run of process_files: what the conditions would remove, without scrubbing.
     
-    removed_from_list = removed_from_list[removal_mask].copy()
+    occurrence_counts comes from count_phone_occurrences on the cleaned list
+    (the totals an OccurrenceIndex keeps for an unchanged or appended list are
+    the same) and log_profiles from profile_log_phones. With a suppression
+    list, phones removed by earlier runs count as hits too, as they do in a
+    run.
     
-    # Step 4: Process log files
-    updated_log_dfs = []
-    removed_log_records = []
+    Returns a dict with the number of 'phones' to remove, their count
+    'by_type' (log type -> phones) and one dict per log file in 'files' with
+    its 'filename', 'rows' and 'affected_rows' (rows that lose a number).
+    """
+    phones_to_remove = find_phones_to_remove(occurrence_counts, conditions)
+    removal_keys = phones_to_remove['Phone'].to_numpy(dtype=np.int64)
     
-    for log_df, filename in zip(cleaned_log_dfs, log_filenames):
-        scrubbed_df = log_df.copy()
-        removed_df = log_df.copy()
-        
-        phone_cols = get_phone_columns(log_df)
+    files = []
+    for profile, filename in zip(log_profiles, log_filenames):
+        removed = _match_phone_keys(profile['keys'], removal_keys) >= 0
+        if suppression_list is not None and len(profile['keys']):
+            removed |= _suppressed_keys(profile, suppression_list)
         
+        # Code -1 picks the trailing False entry
+        removed = np.append(removed, False)
+        affected = removed[profile['codes']].any(axis=1)
+        files.append({
+            'filename': filename,
+            'rows': profile['rows'],
+            'affected_rows': int(np.count_nonzero(affected)),
+        })
+    
+    by_type = phones_to_remove['Log Type'].astype(str).value_counts(sort=False)
+    return {
+        'phones': len(phones_to_remove),
+        'by_type': by_type.to_dict(),
+        'files': files,
+    }
+
+# Removal lookup of a worker process, set once by _init_scrub_worker so it
+# is not sent again with every task
+_worker_lookup = None
+
+def _init_scrub_worker(lookup):
+    """Keep the removal lookup in the worker process for all of its tasks."""
+    global _worker_lookup
+    _worker_lookup = lookup
+
+class ProcessingCancelled(Exception):
+    """Raised by process_files when its cancel_event is set."""
+
+def _scrub_phone_columns(phone_df, phone_cols, lookup, normalize=True):
+    """Find the cells to blank in the phone columns of one cleaned block.
+    
+    Returns the phone columns normalized first (None without normalize,
+    for blocks normalized already), the rows with a hit, their codes and
+    the detail texts: everything a ScrubResult segment needs besides the
+    block itself, so workers never receive or send back the other columns.
+    """
+    if normalize:
+        phone_df = convert_phone_columns_to_string(phone_df)
+    codes, details = _removal_codes(phone_df, phone_cols, lookup)
+    hit_rows = np.flatnonzero((codes >= 0).any(axis=1))
+    return phone_df if normalize else None, hit_rows, codes[hit_rows], details
+
+def _scrub_log_block(task):
+    """Scrub the phone columns of one log block inside a worker process."""
+    phone_df, phone_cols, normalize = task
+    return _scrub_phone_columns(phone_df, phone_cols, _worker_lookup, normalize)
+
+def _scrub_log_files(log_dfs, log_filenames, lookup, workers, chunksize, progress=None, cancel_event=None,
+                     cleaned=False):
+    """Scrub log files block by block, returning a ScrubResult per file in log_filenames order.
+    
+    Unless the frames are cleaned already, blocks are cleaned in this
+    process. With workers set and more than one block, their phone columns
+    are normalized (unless cleaned) and matched on a process pool, otherwise
+    in this process; the segments are built over the blocks here.
+    cancel_event is checked before each block is collected and
+    progress(rows_done, rows_total) is called after it.
+    """
+    blocks = []
+    for file_index, (df, filename) in enumerate(zip(log_dfs, log_filenames)):
+        phone_cols = get_phone_columns(df)
         if not phone_cols:
-            print(f"No phone columns found in {filename}")
-            updated_log_dfs.append(scrubbed_df)
-            removed_log_records.append(pd.DataFrame(columns=log_df.columns))
             continue
+        for start in range(0, max(len(df), 1), chunksize):
+            blocks.append((file_index, df.iloc[start:start + chunksize], phone_cols))
+    
+    total_rows = sum(len(block) for _, block, _ in blocks)
+    rows_done = 0
+    file_segments = {}
+    pool = None
+    if workers and len(blocks) > 1:
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_scrub_worker, initargs=(lookup,))
+    try:
+        cleaned_blocks = []
+        futures = []
+        for _, block, phone_cols in blocks:
+            if cancel_event is not None and cancel_event.is_set():
+                raise ProcessingCancelled("Processing was cancelled")
+            if not cleaned:
+                block = clean_nan_values(block)
+            cleaned_blocks.append(block)
+            if pool:
+                futures.append(pool.submit(
+                    _scrub_log_block, (block[phone_cols].copy(deep=False), phone_cols, not cleaned)
+                ))
         
-        records_with_triggers = set()
-        trigger_info = {}
-        
-        # First pass - identify records with triggering numbers
-        for idx in log_df.index:
-            for col in phone_cols:
-                phone = normalize_phone(log_df.at[idx, col])
-                if is_valid_phone(phone) and phone in phones_to_remove:
-                    records_with_triggers.add(idx)
-                    log_type, count = phones_to_remove[phone]
-                    if idx not in trigger_info:
-                        trigger_info[idx] = []
-                    trigger_info[idx].append((col, phone, log_type, count))
-                    scrubbed_df.at[idx, col] = ''
-        
-        # Second pass - prepare removed records
-        for idx in records_with_triggers:
-            # Blank out ALL phone numbers first
-            for col in phone_cols:
-                removed_df.at[idx, col] = ''
+        for task_index, (file_index, _, phone_cols) in enumerate(blocks):
+            if cancel_event is not None and cancel_event.is_set():
+                raise ProcessingCancelled("Processing was cancelled")
             
-            # Then put back ONLY the triggering numbers
-            reasons = []
-            for col, phone, log_type, count in trigger_info[idx]:
-                removed_df.at[idx, col] = phone
-                reasons.append(f"Number {phone} in column '{col}' exceeded {log_type} count: {count}")
+            block = cleaned_blocks[task_index]
+            if pool:
+                phone_df, hit_rows, hit_codes, details = futures[task_index].result()
+            elif cleaned:
+                phone_df, hit_rows, hit_codes, details = _scrub_phone_columns(block, phone_cols, lookup, False)
+            else:
+                # A standalone frame, so normalizing its columns does not warn about setting on a slice
+                phone_df, hit_rows, hit_codes, details = _scrub_phone_columns(
+                    block[phone_cols].copy(deep=False), phone_cols, lookup
+                )
+            if phone_df is not None:
+                for col in phone_cols:
+                    block[col] = phone_df[col]
+            file_segments.setdefault(file_index, []).append((block, hit_rows, hit_codes, details))
             
-            removed_df.at[idx, 'Removal_Reason'] = ' | '.join(reasons)
-            removed_df.at[idx, 'Removal_Date'] = pd.Timestamp.now().strftime('%d/%m/%Y')
-        
-        # Keep only records with triggers in removed file
-        removed_df = removed_df[removed_df.index.isin(records_with_triggers)].copy()
-        
-        updated_log_dfs.append(scrubbed_df)
-        removed_log_records.append(removed_df)
+            rows_done += len(block)
+            if progress is not None:
+                progress(rows_done, total_rows)
+    finally:
+        if pool:
+            # Blocks not started yet are dropped when cancelling
+            pool.shutdown(cancel_futures=True)
     
-    return list_df_scrubbed, updated_log_dfs, removed_log_records
+    results = []
+    for file_index, (df, filename) in enumerate(zip(log_dfs, log_filenames)):
+        if file_index not in file_segments:
+            print(f"No phone columns found in {filename}")
+            log_df = df if cleaned else convert_phone_columns_to_string(clean_nan_values(df))
+            result = ScrubResult([], lookup['date'])
+            no_codes = np.empty((len(log_df), 0), dtype=np.intp)
+            result.add_segment(ScrubResult.make_segment(log_df, no_codes, lookup['details']))
+        else:
+            # The blocks stay separate segments instead of being concatenated
+            result = ScrubResult(get_phone_columns(df), lookup['date'])
+            for segment in file_segments[file_index]:
+                result.add_segment(segment)
+        results.append(result)
+    
+    return results
+
+def process_files(log_dfs, list_df, conditions, log_filenames, workers=None, chunksize=250_000,
+                  occurrence_index=None, list_source=None, suppression_list=None,
+                  on_removals=None, progress=None, cancel_event=None, lazy=False, cleaned=False):
+    """Process files with consistent phone number handling.
+    
+    Log files are scrubbed in blocks of `chunksize` rows; with workers set,
+    on a pool of that many processes. occurrence_index/list_source enable
+    incremental counting (see find_removal_targets). With a suppression_list,
+    phones it holds from earlier runs are removed from the list and the logs
+    too. The list is not updated here: on_removals(phones_to_remove) is
+    called with this run's removal table (see find_phones_to_remove) so the
+    caller can record it once the results are actually exported.
+    
+    progress(rows_done, rows_total) is called as log rows are scrubbed. If
+    cancel_event (a threading.Event) gets set, ProcessingCancelled is raised
+    before the next block.
+    
+    With lazy set, the outputs are LazyFrames (see ScrubResult) that are only
+    built when written out, so no edited copies of the inputs are made.
+    With cleaned set, the log frames are taken as cleaned already (as
+    ingest.load_log_file leaves them) and are not cleaned or normalized again.
+    """
+    # Initial cleanup and type conversion, Steps 1 and 2
+    cleaned_list_df, phones_to_remove = find_removal_targets(
+        list_df, conditions, occurrence_index, list_source
+    )
+    if cancel_event is not None and cancel_event.is_set():
+        raise ProcessingCancelled("Processing was cancelled")
+    lookup = prepare_removal_lookup(phones_to_remove)
+    if suppression_list is not None:
+        lookup['suppression'] = suppression_list
+    if on_removals is not None:
+        on_removals(phones_to_remove)
+    
+    # Step 3: Process list DataFrame
+    list_scrubbed = _list_scrub_result(cleaned_list_df, lookup).scrubbed()
+    
+    # Step 4: Process log files
+    log_results = _scrub_log_files(
+        log_dfs, log_filenames, lookup, workers, chunksize, progress, cancel_event, cleaned
+    )
+    updated_log_dfs = [result.scrubbed() for result in log_results]
+    removed_log_records = [result.removed() for result in log_results]
+    
+    if lazy:
+        return list_scrubbed, updated_log_dfs, removed_log_records
+    return (
+        list_scrubbed.to_frame(),
+        [frame.to_frame() for frame in updated_log_dfs],
+        [frame.to_frame() for frame in removed_log_records]
+    )
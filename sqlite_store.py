@@ -0,0 +1,34 @@
+import os
+import sqlite3
+from contextlib import closing
+
+# Where the app keeps its local state: indexes, caches and histories
+DATA_DIRECTORY = os.path.join(os.path.expanduser('~'), '.log_processor')
+
+class SQLiteStore:
+    """Base of the on-disk stores kept in a SQLite file.
+
+    SCHEMA is run on every open, so it should only create what is missing.
+    With a SCHEMA_VERSION, a file stamped with another version (PRAGMA
+    user_version) has its tables dropped first and is rebuilt.
+    """
+    SCHEMA = ""
+    SCHEMA_VERSION = None
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn, conn:
+            if self.SCHEMA_VERSION is not None and \
+                    conn.execute("PRAGMA user_version").fetchone()[0] != self.SCHEMA_VERSION:
+                tables = conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall()
+                for (table,) in tables:
+                    conn.execute(f'DROP TABLE IF EXISTS "{table}"')
+                conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+            conn.executescript(self.SCHEMA)
+
+    def _connect(self):
+        """Open a connection; one per call so the store can be used from any thread."""
+        return closing(sqlite3.connect(self.path, timeout=30))
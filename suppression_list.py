@@ -0,0 +1,173 @@
+import os
+import math
+import numpy as np
+import pandas as pd
+from sqlite_store import SQLiteStore, DATA_DIRECTORY
+
+# splitmix64 constants, used to derive the Bloom filter hashes from phone keys
+_MIX_1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX_2 = np.uint64(0x94D049BB133111EB)
+_SECOND_HASH_SEED = np.uint64(0x9E3779B97F4A7C15)
+
+def _mix(values):
+    """splitmix64 finalizer over a uint64 array."""
+    values = (values ^ (values >> np.uint64(30))) * _MIX_1
+    values = (values ^ (values >> np.uint64(27))) * _MIX_2
+    return values ^ (values >> np.uint64(31))
+
+class SuppressionList(SQLiteStore):
+    """Every phone key removed by an exported run, with the log type and count that removed it.
+
+    Lookups are screened by an on-disk (memory-mapped) Bloom filter and only
+    its positives are confirmed against the exact SQLite store, so screening a
+    log costs one vectorized pass no matter how large the history is. The
+    filter is rebuilt at twice the size once it holds more than `capacity`
+    phones. generation counts the changes made through this object, so
+    results derived from the list can tell when they are out of date.
+    """
+    DEFAULT_DIRECTORY = os.path.join(DATA_DIRECTORY, 'suppression')
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS suppressed (
+            phone INTEGER PRIMARY KEY,
+            log_type TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            removed_on TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS bloom (
+            id INTEGER PRIMARY KEY CHECK (id = 0),
+            capacity INTEGER NOT NULL,
+            bits INTEGER NOT NULL,
+            hashes INTEGER NOT NULL
+        );
+    """
+
+    def __init__(self, directory=DEFAULT_DIRECTORY, capacity=10_000_000, error_rate=0.01):
+        self.directory = directory
+        self.error_rate = error_rate
+        self.bloom_path = os.path.join(directory, 'suppressed.bloom')
+        self._bits = None
+        self.generation = 0
+        super().__init__(os.path.join(directory, 'suppressed.sqlite3'))
+
+        with self._connect() as conn:
+            settings = conn.execute("SELECT capacity, bits, hashes FROM bloom").fetchone()
+
+        if settings is None or not os.path.exists(self.bloom_path):
+            self._rebuild(capacity)
+        else:
+            self.capacity, self.bit_count, self.hash_count = settings
+
+    def __getstate__(self):
+        # Worker processes reopen the memory map themselves
+        state = self.__dict__.copy()
+        state['_bits'] = None
+        return state
+
+    def _bit_array(self):
+        if self._bits is None:
+            self._bits = np.memmap(self.bloom_path, dtype=np.uint8, mode='r+')
+        return self._bits
+
+    def _bit_positions(self, keys):
+        """Bloom filter bit positions of each key, shape (hashes, len(keys))."""
+        first = _mix(np.asarray(keys, dtype=np.int64).view(np.uint64))
+        second = _mix(first ^ _SECOND_HASH_SEED) | np.uint64(1)
+        steps = np.arange(self.hash_count, dtype=np.uint64)[:, None]
+        return (first + steps * second) % np.uint64(self.bit_count)
+
+    def _set_bits(self, keys):
+        positions = self._bit_positions(keys).ravel()
+        bits = self._bit_array()
+        np.bitwise_or.at(bits, positions >> np.uint64(3), np.left_shift(1, positions & np.uint64(7)).astype(np.uint8))
+        bits.flush()
+
+    def _rebuild(self, capacity):
+        """Size a new Bloom filter for `capacity` phones and load the stored ones into it."""
+        self.capacity = capacity
+        self.bit_count = max(int(-capacity * math.log(self.error_rate) / math.log(2) ** 2), 64)
+        self.hash_count = max(round(self.bit_count / capacity * math.log(2)), 1)
+
+        self._bits = None
+        bits = np.memmap(self.bloom_path, dtype=np.uint8, mode='w+', shape=(self.bit_count + 7) // 8)
+        bits.flush()
+        del bits
+
+        with self._connect() as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO bloom (id, capacity, bits, hashes) VALUES (0, ?, ?, ?)",
+                (self.capacity, self.bit_count, self.hash_count)
+            )
+            cursor = conn.execute("SELECT phone FROM suppressed")
+            while True:
+                batch = cursor.fetchmany(1_000_000)
+                if not batch:
+                    break
+                self._set_bits(np.array(batch, dtype=np.int64).ravel())
+
+    def __len__(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM suppressed").fetchone()[0]
+
+    def add(self, removals, removed_on=None):
+        """Record a removal table ('Phone' keys, 'Log Type', 'Count'), as built by find_phones_to_remove."""
+        if removals.empty:
+            return
+        removed_on = removed_on or pd.Timestamp.now().strftime('%d/%m/%Y')
+
+        with self._connect() as conn, conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO suppressed (phone, log_type, count, removed_on) VALUES (?, ?, ?, ?)",
+                zip(
+                    removals['Phone'].tolist(),
+                    removals['Log Type'].astype(str).tolist(),
+                    removals['Count'].tolist(),
+                    [removed_on] * len(removals)
+                )
+            )
+            total = conn.execute("SELECT COUNT(*) FROM suppressed").fetchone()[0]
+
+        if total > self.capacity:
+            self._rebuild(max(self.capacity * 2, total))
+        else:
+            self._set_bits(removals['Phone'].to_numpy(dtype=np.int64))
+        self.generation += 1
+
+    def clear(self):
+        """Forget every recorded removal."""
+        with self._connect() as conn, conn:
+            conn.execute("DELETE FROM suppressed")
+        self._rebuild(self.capacity)
+        self.generation += 1
+
+    def might_contain(self, keys):
+        """Vectorized Bloom filter screen: False means the key was never suppressed."""
+        keys = np.asarray(keys, dtype=np.int64)
+        positions = self._bit_positions(keys)
+        bits = self._bit_array()
+        present = (bits[positions >> np.uint64(3)] >> (positions & np.uint64(7)).astype(np.uint8)) & 1
+        return present.all(axis=0).astype(bool)
+
+    def lookup(self, keys):
+        """Suppressed entries among the given phone keys, as a removal table sorted by 'Phone'."""
+        keys = np.unique(np.asarray(keys, dtype=np.int64))
+        candidates = keys[self.might_contain(keys)] if len(keys) else keys
+        if not len(candidates):
+            return pd.DataFrame({
+                'Phone': pd.Series(dtype=np.int64),
+                'Log Type': pd.Series(dtype=object),
+                'Count': pd.Series(dtype=np.int64),
+            })
+
+        # Confirm the Bloom filter positives against the exact store
+        with self._connect() as conn:
+            conn.execute("CREATE TEMP TABLE candidates (phone INTEGER PRIMARY KEY)")
+            conn.executemany("INSERT INTO candidates (phone) VALUES (?)", ((key,) for key in candidates.tolist()))
+            history = pd.read_sql_query(
+                """
+                SELECT s.phone AS "Phone", s.log_type AS "Log Type", s.count AS "Count"
+                FROM suppressed s JOIN candidates c ON c.phone = s.phone
+                ORDER BY s.phone
+                """,
+                conn
+            )
+        return history.astype({'Phone': np.int64, 'Count': np.int64})
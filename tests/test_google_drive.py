@@ -0,0 +1,215 @@
+import datetime
+import hashlib
+import ipaddress
+import json
+import re
+import ssl
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httplib2
+import pytest
+from google.auth.credentials import AnonymousCredentials
+
+from google_drive import GoogleDriveManager, UploadScheduler
+from upload_ledger import UploadLedger
+
+x509 = pytest.importorskip('cryptography.x509')
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+
+class FakeDrive:
+    """Files, resumable upload sessions and scripted failures of the fake Drive server."""
+    def __init__(self):
+        self.files = {}
+        self.sessions = {}
+        # Statuses answered to the next upload requests instead of starting a session
+        self.failures = []
+        # Seconds each upload chunk takes to arrive
+        self.latency = 0.0
+        self.requests = {}
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+
+class FakeDriveHandler(BaseHTTPRequestHandler):
+    """Just enough of the Drive v3 API for resumable uploads and files().get."""
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    @property
+    def drive(self):
+        return self.server.drive
+
+    def _count(self):
+        with self.drive.lock:
+            self.drive.requests[self.command] = self.drive.requests.get(self.command, 0) + 1
+
+    def _send(self, status, body=None, headers=()):
+        data = json.dumps(body or {}).encode('utf-8')
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self):
+        return self.rfile.read(int(self.headers.get('Content-Length') or 0))
+
+    def do_GET(self):
+        self._count()
+        file_id = self.path.split('?')[0].rsplit('/', 1)[1]
+        if file_id not in self.drive.files:
+            return self._send(404, {'error': {'code': 404, 'message': 'File not found'}})
+        content = self.drive.files[file_id][1]
+        self._send(200, {'md5Checksum': hashlib.md5(content).hexdigest(), 'trashed': False})
+
+    def do_POST(self):
+        self._count()
+        metadata = json.loads(self._body() or b'{}')
+        with self.drive.lock:
+            status = self.drive.failures.pop(0) if self.drive.failures else None
+        if status is not None:
+            return self._send(status, {'error': {'code': status, 'message': 'Backend error'}})
+
+        session = uuid.uuid4().hex
+        self.drive.sessions[session] = (metadata, bytearray())
+        self._send(200, headers=[('Location', f'https://{self.headers["Host"]}/upload/session/{session}')])
+
+    def do_PUT(self):
+        self._count()
+        data = self._body()
+        with self.drive.lock:
+            self.drive.active += 1
+            self.drive.max_active = max(self.drive.max_active, self.drive.active)
+        time.sleep(self.drive.latency)
+        with self.drive.lock:
+            self.drive.active -= 1
+
+        metadata, content = self.drive.sessions[self.path.rsplit('/', 1)[1]]
+        total = re.match(r'bytes (?:\d+-\d+|\*)/(\d+)', self.headers['Content-Range']).group(1)
+        content += data
+        if len(content) < int(total):
+            return self._send(308, headers=[('Range', f'bytes=0-{len(content) - 1}')])
+
+        file_id = uuid.uuid4().hex
+        self.drive.files[file_id] = (metadata, bytes(content))
+        self._send(200, {'id': file_id, 'md5Checksum': hashlib.md5(content).hexdigest()})
+
+
+@pytest.fixture(scope='session')
+def certificate(tmp_path_factory):
+    """Self-signed certificate and key files for 127.0.0.1."""
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(x509.oid.NameOID.COMMON_NAME, '127.0.0.1')])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .add_extension(x509.SubjectAlternativeName([x509.IPAddress(ipaddress.ip_address('127.0.0.1'))]), critical=False)
+        .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+        .sign(key, hashes.SHA256())
+    )
+
+    directory = tmp_path_factory.mktemp('certificate')
+    cert_path = directory / 'cert.pem'
+    key_path = directory / 'key.pem'
+    cert_path.write_bytes(cert.public_bytes(serialization.Encoding.PEM))
+    key_path.write_bytes(key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.TraditionalOpenSSL, serialization.NoEncryption()
+    ))
+    return str(cert_path), str(key_path)
+
+
+@pytest.fixture
+def drive(certificate):
+    """A running fake Drive server; its API endpoint is drive.url."""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeDriveHandler)
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(*certificate)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    server.drive = FakeDrive()
+    server.drive.url = f'https://127.0.0.1:{server.server_address[1]}/drive/v3/'
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server.drive
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def make_manager(drive, certificate):
+    def make_manager(**kwargs):
+        return GoogleDriveManager(
+            credentials=AnonymousCredentials(),
+            api_endpoint=drive.url,
+            http_factory=lambda: httplib2.Http(ca_certs=certificate[0]),
+            scheduler=UploadScheduler(base_delay=0.01),
+            **kwargs
+        )
+    return make_manager
+
+
+def write_files(directory, count):
+    """count small CSV files with different content, as (path, content) pairs."""
+    files = []
+    for i in range(count):
+        content = f'Phone,Name\n55500{i:05d},Caller {i}\n'.encode('utf-8')
+        path = directory / f'log{i}.csv'
+        path.write_bytes(content)
+        files.append((str(path), content))
+    return files
+
+
+def test_upload_retries_server_errors(drive, make_manager, tmp_path):
+    [(path, content)] = write_files(tmp_path, 1)
+    drive.failures = [503, 500]
+
+    [result] = make_manager().upload_csv_files([(path, 'log0.csv', 'folder')])
+
+    assert result['error'] is None
+    assert result['action'] == 'created'
+    assert result['retries'] == 2
+    assert drive.files[result['file_id']] == ({'name': 'log0.csv', 'parents': ['folder'], 'mimeType': 'text/csv'}, content)
+
+
+def test_ledger_skips_unchanged_files(drive, make_manager, tmp_path):
+    [(path, content)] = write_files(tmp_path, 1)
+    manager = make_manager(ledger=UploadLedger(str(tmp_path / 'ledger.sqlite3')))
+
+    [first] = manager.upload_csv_files([(path, 'log0.csv', 'folder')])
+    uploads = drive.requests['PUT']
+    [second] = manager.upload_csv_files([(path, 'log0.csv', 'folder')])
+
+    assert first['action'] == 'created'
+    assert second['action'] == 'skipped'
+    assert second['file_id'] == first['file_id']
+    assert second['bytes'] == 0
+    assert drive.requests['PUT'] == uploads
+    assert len(drive.files) == 1
+
+
+def test_uploads_run_in_parallel(drive, make_manager, tmp_path):
+    files = write_files(tmp_path, 4)
+    drive.latency = 0.3
+
+    results = make_manager(upload_workers=4).upload_csv_files(
+        [(path, f'log{i}.csv', 'folder') for i, (path, _) in enumerate(files)]
+    )
+
+    assert [result['error'] for result in results] == [None] * 4
+    assert [drive.files[result['file_id']][1] for result in results] == [content for _, content in files]
+    assert drive.max_active > 1
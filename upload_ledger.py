@@ -0,0 +1,72 @@
+import os
+import hashlib
+import pandas as pd
+from sqlite_store import SQLiteStore, DATA_DIRECTORY
+
+class UploadLedger(SQLiteStore):
+    """Files uploaded to Google Drive, with the MD5 of their content, per folder.
+
+    GoogleDriveManager checks it before uploading: a file name the folder
+    already holds with the same content is not sent again, a known name whose
+    content changed is replaced in place, and a new name with known content
+    is copied on the server. The MD5 matches Drive's md5Checksum, so
+    entries can be confirmed against Drive.
+    """
+    DEFAULT_PATH = os.path.join(DATA_DIRECTORY, 'upload_ledger.sqlite3')
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS uploads (
+            folder_id TEXT NOT NULL,
+            name TEXT NOT NULL,
+            file_id TEXT NOT NULL,
+            md5 TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            uploaded_at TEXT NOT NULL,
+            PRIMARY KEY (folder_id, name)
+        );
+        CREATE INDEX IF NOT EXISTS uploads_by_content ON uploads (folder_id, md5);
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        super().__init__(path)
+
+    @staticmethod
+    def file_md5(path):
+        """Hex MD5 of a file's bytes, as Drive reports it in md5Checksum."""
+        digest = hashlib.md5()
+        with open(path, 'rb') as source:
+            for block in iter(lambda: source.read(1024 * 1024), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def find_content(self, folder_id, md5):
+        """The most recent upload of this content to a folder as {'name', 'file_id'}, or None."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT name, file_id FROM uploads WHERE folder_id = ? AND md5 = ? ORDER BY uploaded_at DESC",
+                (folder_id, md5)
+            ).fetchone()
+        return None if row is None else {'name': row[0], 'file_id': row[1]}
+
+    def find_name(self, folder_id, name):
+        """The upload of a file name in a folder as {'file_id', 'md5'}, or None."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT file_id, md5 FROM uploads WHERE folder_id = ? AND name = ?", (folder_id, name)
+            ).fetchone()
+        return None if row is None else {'file_id': row[0], 'md5': row[1]}
+
+    def record(self, folder_id, name, file_id, md5, size):
+        """Remember a file uploaded (or replaced) on Drive."""
+        with self._connect() as conn, conn:
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO uploads (folder_id, name, file_id, md5, size, uploaded_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (folder_id, name, file_id, md5, size, pd.Timestamp.now().isoformat())
+            )
+
+    def forget(self, file_id):
+        """Drop the entries of a Drive file that no longer exists or changed on Drive."""
+        with self._connect() as conn, conn:
+            conn.execute("DELETE FROM uploads WHERE file_id = ?", (file_id,))
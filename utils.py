@@ -1,38 +1,54 @@
+import io
 import pandas as pd
 import numpy as np
-from io import BytesIO, StringIO
+from io import BytesIO
 import zipfile
 import re
 import csv
 import os
 import datetime
-def clean_nan_values(df):
-    """Replace NaN values and its string variants with empty strings in the DataFrame"""
-    # Make a copy to avoid modifying the original
-    df = df.copy()
+import itertools
+# Every spelling treated as a missing value: 'nan', 'none' and 'null' in any
+# case, plus the exact 'NA' marker
+NULL_TOKENS = frozenset(
+    [''.join(chars) for word in ('nan', 'none', 'null')
+     for chars in itertools.product(*[(c.lower(), c.upper()) for c in word])]
+    + ['NA']
+)
+
+def clean_nan_values(df, inplace=False):
+    """Replace NaN values and its string variants with empty strings in the DataFrame
+    
+    Columns that cannot hold such values (integer, boolean, datetime) are left
+    untouched. Unless inplace is set, the input is not modified and only the
+    cleaned columns are copied.
+    """
+    if not inplace:
+        df = df.copy(deep=False)
     
-    # Replace various forms of NaN with empty string
-    replacements = {
-        np.nan: '',
-        'nan': '',
-        'NaN': '',
-        'Nan': '',
-        'NA': '',
-        'None': '',
-        'null': '',
-        'NULL': '',
-        'NAN': ''
-    }
-    
-    # Apply replacements
-    df = df.replace(replacements)
-    
-    # Additional cleaning for any remaining NaN-like strings
     for column in df.columns:
-        if df[column].dtype == 'object':
-            df[column] = df[column].apply(
-                lambda x: '' if pd.isna(x) or str(x).lower() in ['nan', 'none', 'null'] else x
-            )
+        values = df[column]
+        dtype = values.dtype
+        
+        if isinstance(dtype, pd.CategoricalDtype):
+            # Clean the categories rather than every value
+            null_categories = values.cat.categories[values.cat.categories.isin(NULL_TOKENS)]
+            if len(null_categories) or values.hasnans:
+                if '' not in values.cat.categories:
+                    values = values.cat.add_categories([''])
+                if len(null_categories):
+                    values = values.cat.remove_categories(null_categories)
+                df[column] = values.fillna('')
+        
+        elif pd.api.types.is_float_dtype(dtype):
+            if values.hasnans:
+                df[column] = values.astype(object).where(values.notna(), '')
+        
+        elif dtype == 'object' or pd.api.types.is_string_dtype(dtype):
+            # One hash lookup against all case variants of the null tokens
+            null_mask = values.isna() | values.isin(NULL_TOKENS)
+            if null_mask.any():
+                df[column] = values.mask(null_mask, '')
     
     return df
 
@@ -51,43 +67,6 @@ def clean_number(phone):
         phone = phone[1:]
     return phone
 
-def format_dataframe_for_export(df):
-    """Prepare DataFrame for export with proper formatting"""
-    formatted_df = df.copy()
-    
-    # Process each column
-    for column in formatted_df.columns:
-        # Get column data type
-        col_type = formatted_df[column].dtype
-        
-        if col_type == 'object':
-            # Replace NaN with empty string first
-            formatted_df[column] = formatted_df[column].fillna('')
-            # Clean string values
-            formatted_df[column] = formatted_df[column].astype(str)
-            formatted_df[column] = formatted_df[column].apply(lambda x: '' if x.lower() in ['nan', 'none', 'null'] else x.strip())
-            formatted_df[column] = formatted_df[column].replace({'\n': ' ', '\r': ' '})
-            
-        elif np.issubdtype(col_type, np.number):
-            # Format numbers consistently and handle NaN
-            formatted_df[column] = formatted_df[column].apply(
-                lambda x: f"{int(x)}" if pd.notnull(x) and float(x).is_integer() 
-                else (f"{x:.2f}" if pd.notnull(x) else '')
-            )
-            
-        # Handle date columns if any
-        elif pd.api.types.is_datetime64_any_dtype(col_type):
-            formatted_df[column] = formatted_df[column].fillna('')
-            formatted_df[column] = formatted_df[column].apply(
-                lambda x: x.strftime('%Y-%m-%d') if pd.notnull(x) else '')
-    
-    # Clean column names
-    formatted_df.columns = formatted_df.columns.str.strip()
-    formatted_df.columns = formatted_df.columns.str.replace('[^\w\s-]', '')
-    
-    return formatted_df
-
-
 def clean_filename(filename):
     """Sanitize filenames to remove invalid characters."""
     return re.sub(r'[<>:"/\\|?*]', '_', filename).strip()
@@ -129,79 +108,146 @@ def format_value(val):
             return f'"{val_str}"'
         return val_str
 
-def create_zip_file(dfs_dict):
-    """Create a zip file containing CSV files with proper field alignment."""
-    zip_buffer = BytesIO()
-    
-    with zipfile.ZipFile(zip_buffer, 'w') as zip_file:
-        for filename, df in dfs_dict.items():
-            # Process DataFrame
-            processed_df = df.copy()
-            
-            # Ensure all columns exist
-            for col in processed_df.columns:
-                if col not in processed_df.columns:
-                    processed_df[col] = ''
-            
-            # Get expected number of columns
-            expected_columns = len(processed_df.columns)
-            
-            # Convert all columns to strings with proper formatting
-            for col in processed_df.columns:
-                processed_df[col] = processed_df[col].apply(format_value)
-            
-            # Create buffer
-            csv_buffer = StringIO()
-            
-            # Write headers
-            header_row = ','.join(str(col) for col in processed_df.columns)
-            csv_buffer.write(header_row + '\n')
-            
-            # Write data rows with alignment check
-            for idx, row in processed_df.iterrows():
-                # Format row values
-                row_values = [str(val) for val in row]
-                
-                # Ensure row has correct number of fields
-                if len(row_values) < expected_columns:
-                    row_values.extend([''] * (expected_columns - len(row_values)))
-                elif len(row_values) > expected_columns:
-                    row_values = row_values[:expected_columns]
-                
-                # Write row
-                row_str = ','.join(row_values)
-                csv_buffer.write(row_str + '\n')
-            
-            # Clean filename
-            safe_filename = filename.replace('/', '_').replace('\\', '_')
-            if not safe_filename.lower().endswith('.csv'):
-                safe_filename += '.csv'
-            
-            # Write to zip
-            csv_buffer.seek(0)
-            content = csv_buffer.getvalue()
-            
-            # Double-check content before writing
-            lines = content.split('\n')
-            header_count = len(header_row.split(','))
-            
-            # Verify each line has correct number of fields
-            verified_lines = []
-            for line in lines:
-                if line:  # Skip empty lines
-                    fields = line.split(',')
-                    if len(fields) < header_count:
-                        fields.extend([''] * (header_count - len(fields)))
-                    elif len(fields) > header_count:
-                        fields = fields[:header_count]
-                    verified_lines.append(','.join(fields))
-            
-            # Write verified content
-            verified_content = '\n'.join(verified_lines)
-            zip_file.writestr(safe_filename, verified_content.encode('utf-8'))
-    
-    zip_buffer.seek(0)
-    return zip_buffer.getvalue()
+# Strings that float() reads as a finite number in format_value
+NUMBER_PATTERN = r'[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?'
+
+def _format_numbers(numbers):
+    """Format floats as format_value does: whole numbers without decimals, others via str()."""
+    numbers = np.asarray(numbers, dtype='float64')
+    formatted = numbers.astype(str).astype(object)
+    
+    whole = np.isfinite(numbers) & (numbers == np.trunc(numbers))
+    in_range = whole & (np.abs(numbers) < 2 ** 63)
+    formatted[in_range] = numbers[in_range].astype('int64').astype(str)
+    for i in np.flatnonzero(whole & ~in_range):
+        formatted[i] = str(int(numbers[i]))
+    return formatted
+
+def _format_texts(texts):
+    """Format stripped strings as format_value does: ISO dates, numbers, or unchanged."""
+    texts = pd.Series(texts, dtype=object)
+    formatted = texts.to_numpy(dtype=object, copy=True)
+    
+    # YYYY-MM-DD style dates become DD/MM/YYYY
+    date_like = texts.str.fullmatch(r'.{4}-.{2}-.{2}', flags=re.DOTALL).to_numpy(dtype=bool)
+    if date_like.any():
+        dates = pd.to_datetime(texts[date_like], errors='coerce', format='ISO8601')
+        parsed = dates.notna().to_numpy()
+        formatted[np.flatnonzero(date_like)[parsed]] = dates[parsed].dt.strftime('%d/%m/%Y').to_numpy()
+        date_like[np.flatnonzero(date_like)[~parsed]] = False
+    
+    numeric = texts.str.fullmatch(NUMBER_PATTERN).to_numpy(dtype=bool) & ~date_like
+    if numeric.any():
+        numbers = np.asarray(formatted[numeric], dtype=str).astype('float64')
+        formatted[numeric] = _format_numbers(numbers)
+    return formatted
+
+def format_column(values):
+    """Vectorized format_value over a whole column, returning an object array of strings.
+    
+    Unlike format_value, values are not quoted here; quoting is left to the
+    CSV writer.
+    """
+    values = pd.Series(values)
+    dtype = values.dtype
+    
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return values.dt.strftime('%d/%m/%Y').fillna('').to_numpy(dtype=object)
+    if dtype == np.bool_:
+        return np.where(values.to_numpy(), 'True', 'False').astype(object)
+    if isinstance(dtype, pd.CategoricalDtype):
+        # Format each category once; missing values (code -1) pick the trailing ''
+        categories = format_column(pd.Series(values.cat.categories, dtype=values.cat.categories.dtype))
+        return np.append(categories, '').astype(object)[values.cat.codes.to_numpy()]
+    if isinstance(dtype, np.dtype) and dtype.kind in 'iuf':
+        formatted = _format_numbers(values.to_numpy(dtype='float64'))
+        formatted[values.isna().to_numpy()] = ''
+        return formatted
+    
+    values = values.to_numpy(dtype=object)
+    formatted = np.full(len(values), '', dtype=object)
+    present = ~pd.isna(values)
+    present[present] = values[present] != ''
+    
+    kinds = pd.Series(values).map(type)
+    kind_set = kinds[present].unique()
+    number_kinds = [k for k in kind_set if issubclass(k, (float, int)) and not issubclass(k, bool)]
+    timestamp_kinds = [k for k in kind_set if issubclass(k, pd.Timestamp)]
+    is_number = present & kinds.isin(number_kinds).to_numpy()
+    is_timestamp = present & kinds.isin(timestamp_kinds).to_numpy()
+    is_text = present & ~is_number & ~is_timestamp
+    
+    if is_number.any():
+        formatted[is_number] = _format_numbers(values[is_number].astype('float64'))
+    if is_timestamp.any():
+        formatted[is_timestamp] = [value.strftime('%d/%m/%Y') for value in values[is_timestamp]]
+    if is_text.any():
+        texts = pd.Series(values[is_text].astype(str), dtype=object).str.strip()
+        formatted[is_text] = _format_texts(texts)
+    return formatted
+
+class LazyFrame:
+    """A DataFrame that is only built when needed, block by block.
+
+    blocks_fn(chunk_rows) yields the rows as consecutive DataFrames of at most
+    chunk_rows rows; frame_fn() builds the whole DataFrame. Writers such as
+    write_formatted_csv stream the blocks so the full frame never exists.
+    """
+    def __init__(self, columns, length, blocks_fn, frame_fn):
+        self.columns = pd.Index(columns)
+        self.length = length
+        self._blocks_fn = blocks_fn
+        self._frame_fn = frame_fn
+    
+    def __len__(self):
+        return self.length
+    
+    @property
+    def empty(self):
+        return self.length == 0 or len(self.columns) == 0
+    
+    def blocks(self, chunk_rows=100_000):
+        return self._blocks_fn(chunk_rows)
+    
+    def to_frame(self):
+        return self._frame_fn()
+
+def iter_blocks(df, chunk_rows=100_000):
+    """Consecutive row blocks of a DataFrame or LazyFrame."""
+    if isinstance(df, LazyFrame):
+        yield from df.blocks(chunk_rows)
+        return
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+def write_formatted_csv(text_file, df, chunk_rows=100_000):
+    """Write a DataFrame (or LazyFrame) as CSV with format_column formatting, one block of rows at a time."""
+    writer = csv.writer(text_file, lineterminator='\n')
+    writer.writerow([str(col) for col in df.columns])
+    
+    for block in iter_blocks(df, chunk_rows):
+        columns = [format_column(block.iloc[:, i]) for i in range(block.shape[1])]
+        writer.writerows(zip(*columns))
+
+def zip_member_name(filename):
+    """Name of the CSV member a file is stored under in the export ZIPs."""
+    safe_filename = filename.replace('/', '_').replace('\\', '_')
+    if not safe_filename.lower().endswith('.csv'):
+        safe_filename += '.csv'
+    return safe_filename
+
+def write_csv_file(df, path):
+    """Encode a DataFrame as an export CSV file; the same bytes feed the ZIPs and Drive."""
+    with open(path, 'w', encoding='utf-8', newline='') as text_file:
+        write_formatted_csv(text_file, df)
+    return path
+
+def zip_csv_files(csv_paths, destination):
+    """Create a zip file from already encoded CSV files, given as {filename: path}."""
+    with zipfile.ZipFile(destination, 'w') as zip_file:
+        for filename, path in csv_paths.items():
+            zip_file.write(path, zip_member_name(filename))
+    return destination
 
 def prepare_dataframe_for_export(df):
     """Prepare DataFrame ensuring exact format matching and field alignment."""
@@ -209,6 +255,6 @@ def prepare_dataframe_for_export(df):
     
     # Process each column
     for col in df.columns:
-        df[col] = df[col].apply(format_value)
+        df[col] = format_column(df[col])
     
     return df
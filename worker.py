@@ -0,0 +1,101 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from PySide6.QtCore import QObject, QThread, Signal
+from processor import ProcessingCancelled
+
+class TaskWorker(QObject):
+    """Runs a function on its own QThread so the window stays responsive.
+
+    The function is called as fn(progress, cancel_event). Calling
+    progress(done, total) emits the progress signal together with the rate
+    per second since the start; cancel() sets cancel_event, and a function
+    that stops by raising ProcessingCancelled emits cancelled. Signals are
+    delivered to the GUI thread.
+    """
+    progress = Signal(object, object, float)
+    finished = Signal(object)
+    failed = Signal(str)
+    cancelled = Signal()
+
+    def __init__(self, fn):
+        super().__init__()
+        self.fn = fn
+        self.cancel_event = threading.Event()
+        self._started = None
+        self._thread = QThread()
+        self.moveToThread(self._thread)
+        self._thread.started.connect(self.run)
+
+    def start(self):
+        self._thread.start()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def wait(self):
+        """Block until the thread has fully stopped."""
+        self._thread.wait()
+
+    def _report(self, done, total):
+        elapsed = time.perf_counter() - self._started
+        self.progress.emit(done, total, done / elapsed if elapsed > 0 else 0.0)
+
+    def run(self):
+        self._started = time.perf_counter()
+        try:
+            result = self.fn(self._report, self.cancel_event)
+        except ProcessingCancelled:
+            self.cancelled.emit()
+        except Exception as e:
+            self.failed.emit(str(e))
+        else:
+            self.finished.emit(result)
+        finally:
+            self._thread.quit()
+
+
+class CsvLoader(QObject):
+    """Reads several CSV files concurrently on a thread pool.
+
+    loaded(path, df, seconds) or load_failed(path, error) is emitted for each
+    file as soon as it is done, in completion order, and finished() once
+    every file is. A failing file does not stop the others.
+    """
+    loaded = Signal(str, object, float)
+    load_failed = Signal(str, str)
+    finished = Signal()
+
+    def __init__(self, read_fn, max_workers=None):
+        super().__init__()
+        self.read_fn = read_fn
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    def start(self, paths):
+        if not paths:
+            self.finished.emit()
+            return
+        self._pending = len(paths)
+        pool = ThreadPoolExecutor(max_workers=self.max_workers or min(len(paths), os.cpu_count() or 1))
+        for path in paths:
+            pool.submit(self._load, path)
+        # The pool threads exit once the queued files are read
+        pool.shutdown(wait=False)
+
+    def _load(self, path):
+        started = time.perf_counter()
+        try:
+            df = self.read_fn(path)
+        except Exception as e:
+            self.load_failed.emit(path, str(e))
+        else:
+            self.loaded.emit(path, df, time.perf_counter() - started)
+        finally:
+            with self._lock:
+                self._pending -= 1
+                done = self._pending == 0
+            if done:
+                self.finished.emit()